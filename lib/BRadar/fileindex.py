@@ -0,0 +1,224 @@
+"""
+A persistent index of the headers of a collection of radar files.
+
+The index is an sqlite database that holds, for each file, what
+:func:`BRadar.io.LoadRadarHeader` reads from it (time, station, variable,
+format and grid extent), along with the file's modification time and size.
+Updating the index only reads the headers of new or changed files, and
+queries by time, station or variable never open the radar files.
+
+    >>> index = RadarIndex('radar_index.db')
+    >>> index.update('/data/radar')
+    >>> files = index.query(start=datetime.datetime(2011, 4, 27, 18),
+    ...                     end=datetime.datetime(2011, 4, 27, 21),
+    ...                     station='KBMX', var_name='Reflectivity')
+"""
+
+import os
+import os.path
+import sqlite3
+import calendar
+import datetime
+import fnmatch
+
+from BRadar.io import LoadRadarHeader
+from BRadar.rasterstore import _HEADER_NAME, _FRAMES_NAME
+
+# Bump whenever the table layout changes, to rebuild old indexes.
+_indexVersion = 1
+
+_columns = ('path', 'mtime', 'size', 'valid', 'data_type',
+            'scan_time', 'last_time', 'time_count', 'station', 'var_name',
+            'lat_min', 'lat_max', 'lon_min', 'lon_max', 'lat_count',
+            'lon_count')
+
+
+def _seconds(timeVal) :
+    """
+    Seconds since 1970-1-1 for a datetime (in UTC) or a number.
+    """
+    if isinstance(timeVal, datetime.datetime) :
+        return (calendar.timegm(timeVal.timetuple()) +
+                timeVal.microsecond / 1e6)
+    return float(timeVal)
+
+
+def _header_row(path, stat, header) :
+    """
+    The table row for *path*, whose :func:`os.stat` is *stat*, from its
+    *header* dictionary (None if the header could not be read).
+    """
+    row = dict.fromkeys(_columns)
+    row.update(path=path, mtime=stat.st_mtime, size=stat.st_size,
+               valid=int(header is not None))
+    if header is None :
+        return row
+
+    for key in ('data_type', 'station', 'var_name') :
+        row[key] = header[key]
+    for key in ('scan_time', 'last_time') :
+        row[key] = (float(header[key]) if header[key] is not None else None)
+    row['time_count'] = int(header['time_count'])
+
+    if header['lats'] is not None and len(header['lats']) > 0 :
+        row.update(lat_min=float(min(header['lats'])),
+                   lat_max=float(max(header['lats'])),
+                   lat_count=len(header['lats']))
+    if header['lons'] is not None and len(header['lons']) > 0 :
+        row.update(lon_min=float(min(header['lons'])),
+                   lon_max=float(max(header['lons'])),
+                   lon_count=len(header['lons']))
+    return row
+
+
+class RadarIndex(object) :
+    def __init__(self, dbfile, load_func=None) :
+        """
+        Open (or create) the index stored in the sqlite file *dbfile*.
+        Use ':memory:' for an index that is not saved.
+
+        *load_func*     Function that takes a filename string and returns
+                        a header dictionary.  If None, then default to
+                        :func:`BRadar.io.LoadRadarHeader`.
+        """
+        self._load_func = (load_func if load_func is not None else
+                           LoadRadarHeader)
+        self._db = sqlite3.connect(dbfile)
+
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != _indexVersion :
+            self._db.execute("DROP TABLE IF EXISTS files")
+
+        self._db.execute("CREATE TABLE IF NOT EXISTS files ("
+                         "path TEXT PRIMARY KEY, mtime REAL, size INTEGER, "
+                         "valid INTEGER, data_type TEXT, scan_time REAL, "
+                         "last_time REAL, time_count INTEGER, station TEXT, "
+                         "var_name TEXT, lat_min REAL, lat_max REAL, "
+                         "lon_min REAL, lon_max REAL, lat_count INTEGER, "
+                         "lon_count INTEGER)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_time "
+                         "ON files (scan_time)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_station "
+                         "ON files (station, var_name)")
+        self._db.execute("PRAGMA user_version = %d" % _indexVersion)
+        self._db.commit()
+
+    def __len__(self) :
+        return self._db.execute("SELECT COUNT(*) FROM files "
+                                "WHERE valid").fetchone()[0]
+
+    def update(self, root, pattern='*') :
+        """
+        Bring the index up to date with the files under the directory
+        *root* whose names match the glob *pattern*.
+
+        A :class:`BRadar.rasterstore.RasterStore` directory is indexed as
+        one entry (its name must match *pattern*), and the files in it
+        are skipped.
+
+        Only files that are new, or whose modification time or size
+        changed, are read.  Files matching *pattern* that no longer exist
+        are dropped (other indexed files are left alone).
+        Files that can not be read are remembered, so that they
+        are not tried again until they change.
+
+        Returns the number of files read and the number dropped.
+        """
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, '')
+        known = dict((path, (mtime, size)) for path, mtime, size in
+                     self._db.execute("SELECT path, mtime, size FROM files")
+                     if path == root or path.startswith(prefix))
+
+        rows = []
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(root) :
+            if _HEADER_NAME in filenames :
+                # A raster store.  Don't descend into it.
+                dirnames[:] = []
+                if not fnmatch.fnmatch(os.path.basename(dirpath), pattern) :
+                    continue
+                # Its list of frames changes whenever a frame is added.
+                entries = [(dirpath, os.path.join(dirpath, _FRAMES_NAME))]
+            else :
+                entries = [(os.path.join(dirpath, name),) * 2 for
+                           name in fnmatch.filter(filenames, pattern)]
+
+            for path, statPath in entries :
+                try :
+                    stat = os.stat(statPath)
+                except OSError :
+                    continue
+                seen.add(path)
+                if known.get(path) == (stat.st_mtime, stat.st_size) :
+                    continue
+
+                try :
+                    header = self._load_func(path)
+                except Exception :
+                    header = None
+                rows.append(_header_row(path, stat, header))
+
+        # Only what this pattern covers could have been seen.
+        gone = [(path,) for path in known if path not in seen and
+                fnmatch.fnmatch(os.path.basename(path), pattern)]
+
+        with self._db :
+            self._db.executemany("INSERT OR REPLACE INTO files (%s) "
+                                 "VALUES (%s)" %
+                                 (', '.join(_columns),
+                                  ', '.join('?' * len(_columns))),
+                                 [tuple(row[key] for key in _columns) for
+                                  row in rows])
+            self._db.executemany("DELETE FROM files WHERE path = ?", gone)
+
+        return len(rows), len(gone)
+
+    def query(self, start=None, end=None, station=None, var_name=None,
+              data_type=None) :
+        """
+        Paths of the indexed files, in time order, that have scans
+        between *start* and *end* (datetimes in UTC, or seconds since
+        1970-1-1), and that match the *station*, *var_name* and
+        *data_type*, if given.  Each of those can also be a list.
+        """
+        return [row['path'] for row in
+                self.headers(start, end, station, var_name, data_type)]
+
+    def headers(self, start=None, end=None, station=None, var_name=None,
+                data_type=None) :
+        """
+        Same as :meth:`query`, but returns a dictionary of the indexed
+        header info for each file (see the columns of the index).
+        """
+        where = ["valid"]
+        params = []
+        if start is not None :
+            where.append("last_time >= ?")
+            params.append(_seconds(start))
+        if end is not None :
+            where.append("scan_time <= ?")
+            params.append(_seconds(end))
+
+        for column, value in (('station', station), ('var_name', var_name),
+                              ('data_type', data_type)) :
+            if value is None :
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            where.append("%s IN (%s)" % (column, ', '.join('?' * len(values))))
+            params.extend(values)
+
+        cursor = self._db.execute("SELECT %s FROM files WHERE %s "
+                                  "ORDER BY scan_time, path" %
+                                  (', '.join(_columns), ' AND '.join(where)),
+                                  params)
+        return [dict(zip(_columns, row)) for row in cursor]
+
+    def close(self) :
+        self._db.close()
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *args) :
+        self.close()
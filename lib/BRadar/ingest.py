@@ -0,0 +1,355 @@
+"""
+A real-time ingest service for radar files dropped into directories
+by a data feed.
+
+:class:`IngestService` polls the watched directories, and each new file
+is loaded (with :func:`BRadar.io.LoadRadar` by default), rasterized with
+:func:`BRadar.rasterize.Rastify` and saved with
+:func:`BRadar.io.SaveRastRadar`, in an executor pool.  At most *workers*
+files are processed at a time, and at most *maxPending* files wait in
+the queue.  When the queue is full, polling waits, so a burst of files
+never piles up in memory.
+
+The latency of each stage ('queue', 'load', 'rastify', 'save' and
+'total') is recorded, see :meth:`IngestService.stats`.
+
+    >>> service = IngestService(['/data/feed'], '/data/rast', cellSize=0.01)
+    >>> asyncio.run(service.run())
+"""
+
+import os
+import os.path
+import time
+import fnmatch
+import threading
+import calendar
+import datetime
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from BRadar.io import LoadRadar, SaveRastRadar
+
+_stages = ('queue', 'load', 'rastify', 'save', 'total')
+
+
+def _first_sweep(coord) :
+    """
+    The first sweep of a (sweep, ...) coordinate, made to broadcast
+    against the (radial, gate) data of that sweep.
+    """
+    coord = np.asarray(coord)
+    if coord.ndim == 3 :
+        return coord[0]
+    if coord.ndim == 2 :
+        # (sweep, radial)
+        return coord[0][:, np.newaxis]
+    return coord
+
+
+def RastifyScan(radData, cellSize=None, latAxis=None, lonAxis=None) :
+    """
+    Rasterize a radar data dictionary from one of the loaders in
+    :mod:`BRadar.io` with :func:`BRadar.rasterize.Rastify`.
+    For volumes, only the first (lowest) sweep is used.
+
+    Returns (rastData, latAxis, lonAxis).
+    """
+    from BRadar.rasterize import Rastify
+
+    vals = radData['vals']
+    azimuths = radData['azimuth']
+    rangeGates = radData['range_gate']
+    elevAngle = radData['elev_angle']
+    if np.ndim(vals) == 3 :
+        vals = vals[0]
+        azimuths = _first_sweep(azimuths)
+        rangeGates = _first_sweep(rangeGates)
+        elevAngle = _first_sweep(elevAngle)
+
+    return Rastify(radData['stat_lat'], radData['stat_lon'], vals,
+                   azimuths, rangeGates, elevAngle,
+                   radData['beam_width'] / 2.0, radData['gate_length'] / 2.0,
+                   cellSize=cellSize, latAxis=latAxis, lonAxis=lonAxis,
+                   mask=True)
+
+
+def _claim_name(tmpfile, outfile) :
+    """
+    Give *tmpfile* the name *outfile*, or, if that is taken (e.g., two
+    files with the same station, variable and time), *outfile* with
+    a '_1', '_2', ... suffix.  Never overwrites an existing file.
+
+    Returns the name used.
+    """
+    root, ext = os.path.splitext(outfile)
+    count = 0
+    while True :
+        name = outfile if count == 0 else '%s_%d%s' % (root, count, ext)
+        try :
+            # Unlike a rename, a hard link fails if the name exists.
+            os.link(tmpfile, name)
+        except FileExistsError :
+            count += 1
+            continue
+        os.remove(tmpfile)
+        return name
+
+
+def _ingest_file(filename, outDir, load_func, rastify_func, gridArgs,
+                 station) :
+    """
+    Load, rasterize and save *filename*, all in one executor call.
+
+    Returns the output filename and the time taken by each stage.
+    """
+    timings = {}
+    startTime = time.time()
+    radData = load_func(filename)
+    timings['load'] = time.time() - startTime
+
+    startTime = time.time()
+    rastData, latAxis, lonAxis = rastify_func(radData, **gridArgs)
+    timings['rastify'] = time.time() - startTime
+
+    startTime = time.time()
+    scanTime = radData['scan_time']
+    if isinstance(scanTime, datetime.datetime) :
+        scanTime = calendar.timegm(scanTime.timetuple())
+    scanTime = int(scanTime)
+    station = radData.get('station') or station
+    varName = radData['var_name']
+
+    outfile = os.path.join(outDir, '%s_%s_%s.nc' %
+                           (station, varName,
+                            datetime.datetime.utcfromtimestamp(
+                                scanTime).strftime('%Y%m%d_%H%M%S')))
+    # Write under a temporary name, so that nobody sees a partial file.
+    # Each worker thread (or process) handles one file at a time.
+    tmpfile = '%s.%d-%d.part' % (outfile, os.getpid(),
+                                 threading.current_thread().ident)
+    try :
+        SaveRastRadar(tmpfile, rastData, latAxis, lonAxis,
+                      scanTime, varName, station)
+        outfile = _claim_name(tmpfile, outfile)
+    except :
+        if os.path.exists(tmpfile) :
+            os.remove(tmpfile)
+        raise
+    timings['save'] = time.time() - startTime
+
+    return outfile, timings
+
+
+class IngestService(object) :
+    def __init__(self, watchDirs, outDir, pattern='*', cellSize=None,
+                 latAxis=None, lonAxis=None, pollInterval=2.0, settle=1.0,
+                 workers=2, maxPending=8, processes=False, load_func=None,
+                 rastify_func=None, station='NWRT', metricWindow=1000) :
+        """
+        Watch *watchDirs* (a directory or list of directories) for new
+        files matching the glob *pattern*, and save them rasterized
+        into *outDir*, as 'STATION_VARIABLE_YYYYMMDD_HHMMSS.nc'.  An
+        existing file is never overwritten; a numbered suffix is added.
+
+        *cellSize*, *latAxis*, *lonAxis*
+                        The grid for :func:`BRadar.rasterize.Rastify`.
+
+        *pollInterval*  Seconds between scans of the directories.
+
+        *settle*        Seconds that a file must be left unmodified
+                        before it is picked up, so that files that are
+                        still being written are left alone.
+
+        *workers*       Maximum number of files processed at a time.
+
+        *maxPending*    Maximum number of files waiting to be processed.
+
+        *processes*     Process the files in a pool of processes rather
+                        than threads (rasterizing is CPU-bound).  Then,
+                        *load_func* and *rastify_func* must be picklable.
+
+        *load_func*     Function that takes a filename string and returns a
+                        radar data dictionary.  Default is
+                        :func:`BRadar.io.LoadRadar`.
+
+        *rastify_func*  Function that takes the radar data dictionary and
+                        the grid keywords, and returns (rastData, latAxis,
+                        lonAxis).  Default is :func:`RastifyScan`.
+
+        *station*       Station name for files that do not have one
+                        (e.g., PAR files).
+
+        *metricWindow*  Number of recent latencies kept for each stage.
+        """
+        if isinstance(watchDirs, str) :
+            watchDirs = [watchDirs]
+        if cellSize is None and (latAxis is None or lonAxis is None) :
+            raise ValueError("Must specify *cellSize* if *latAxis* and/or"
+                             " *lonAxis* is not given")
+
+        self.watchDirs = list(watchDirs)
+        self.outDir = outDir
+        self.pattern = pattern
+        self.pollInterval = pollInterval
+        self.settle = settle
+        self.workers = workers
+        self.maxPending = maxPending
+        self.processes = processes
+        self.station = station
+
+        self._load_func = load_func if load_func is not None else LoadRadar
+        self._rastify_func = (rastify_func if rastify_func is not None else
+                              RastifyScan)
+        self._gridArgs = dict(cellSize=cellSize, latAxis=latAxis,
+                              lonAxis=lonAxis)
+
+        # filename -> (mtime, size) of the files already queued
+        self._seen = {}
+        self._latency = dict((stage, deque(maxlen=metricWindow)) for
+                             stage in _stages)
+        self._queue = None
+        self._stopping = False
+
+        # filename -> output filename, or the exception that it raised
+        self.processed = {}
+        self.failed = {}
+
+    def stats(self) :
+        """
+        Latency statistics (in seconds) of each stage, over the
+        last *metricWindow* files, as a dictionary of dictionaries
+        with 'count', 'mean', 'p50', 'p95' and 'max' keys.
+        Also has the counts of 'processed', 'failed' and 'pending' files.
+        """
+        result = {}
+        for stage, latencies in self._latency.items() :
+            latencies = np.array(latencies)
+            if len(latencies) == 0 :
+                result[stage] = {'count': 0, 'mean': None, 'p50': None,
+                                 'p95': None, 'max': None}
+                continue
+            result[stage] = {'count': len(latencies),
+                             'mean': latencies.mean(),
+                             'p50': np.percentile(latencies, 50),
+                             'p95': np.percentile(latencies, 95),
+                             'max': latencies.max()}
+
+        result['processed'] = len(self.processed)
+        result['failed'] = len(self.failed)
+        result['pending'] = (self._queue.qsize() if self._queue is not None
+                             else 0)
+        return result
+
+    def _new_files(self) :
+        """
+        The settled files that have not been queued yet (or that
+        changed since then), oldest first.  This blocks on the file
+        system, so :meth:`poll` runs it in an executor.
+        """
+        now = time.time()
+        found = []
+        for watchDir in self.watchDirs :
+            for dirpath, dirnames, filenames in os.walk(watchDir) :
+                for name in fnmatch.filter(filenames, self.pattern) :
+                    path = os.path.join(dirpath, name)
+                    try :
+                        info = os.stat(path)
+                    except OSError :
+                        # Removed by the feed in the meantime
+                        continue
+                    stamp = (info.st_mtime, info.st_size)
+                    if (self._seen.get(path) != stamp and
+                        now - info.st_mtime >= self.settle) :
+                        found.append((info.st_mtime, path, stamp))
+        found.sort()
+        return [(path, stamp) for _, path, stamp in found]
+
+    def _record(self, stage, seconds) :
+        self._latency[stage].append(seconds)
+
+    async def poll(self) :
+        """
+        Queue the new files in the watched directories.
+        This waits for room in the queue (backpressure).
+
+        Returns the number of files queued.
+        """
+        # Don't hold up the event loop while walking the directories.
+        newFiles = await asyncio.get_event_loop().run_in_executor(
+            None, self._new_files)
+        count = 0
+        for path, stamp in newFiles :
+            if self._stopping :
+                break
+            self._seen[path] = stamp
+            await self._queue.put((path, time.time()))
+            count += 1
+        return count
+
+    async def _worker(self, executor) :
+        loop = asyncio.get_event_loop()
+        while True :
+            path, queuedAt = await self._queue.get()
+            try :
+                self._record('queue', time.time() - queuedAt)
+                outfile, timings = await loop.run_in_executor(
+                    executor, functools.partial(_ingest_file, path,
+                                                self.outDir, self._load_func,
+                                                self._rastify_func,
+                                                self._gridArgs, self.station))
+                for stage, seconds in timings.items() :
+                    self._record(stage, seconds)
+                self._record('total', time.time() - queuedAt)
+                self.processed[path] = outfile
+                self.failed.pop(path, None)
+            except Exception as err :
+                self.failed[path] = err
+            finally :
+                self._queue.task_done()
+
+    async def _serve(self, once) :
+        if not os.path.isdir(self.outDir) :
+            os.makedirs(self.outDir)
+
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.maxPending)
+        executor = (ProcessPoolExecutor if self.processes else
+                    ThreadPoolExecutor)(self.workers)
+        workers = [asyncio.ensure_future(self._worker(executor)) for
+                   _ in range(self.workers)]
+        try :
+            while not self._stopping :
+                await self.poll()
+                if once :
+                    break
+                await asyncio.sleep(self.pollInterval)
+            await self._queue.join()
+        finally :
+            for worker in workers :
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            executor.shutdown(wait=True)
+
+    async def run(self) :
+        """
+        Poll and process files until :meth:`stop` is called.
+        The queued files are finished before returning.
+        """
+        await self._serve(once=False)
+
+    async def run_once(self) :
+        """
+        Process the files that are in the watched directories now
+        (e.g., for batch jobs and testing), then return.
+        """
+        await self._serve(once=True)
+
+    def stop(self) :
+        """
+        Ask :meth:`run` to stop polling and return.
+        """
+        self._stopping = True
@@ -4,12 +4,43 @@ All of the loading functions will load the data into (theta, r) coordinates
 They will also produce coordinate data that will be parallel to the data array.
 In other words, you will have three 2-D arrays: data, range gate [Meters],
 azimuth [DEGREES north].
+
+With *compact=True*, the PAR loaders instead return coordinates that only
+broadcast against the data array (e.g., azimuth as (azi, 1) and range gate
+as (1, range)), which avoids two full-sized arrays that only hold 1-D
+information.  Use np.broadcast_arrays() to get zero-copy full-sized views.
+LoadLevel2() and LoadArchive2() always return broadcastable coordinates.
+
+The loaders also accept gzip (.gz) and bzip2 (.bz2) compressed files, and
+open file objects in place of a filename.  Compressed files are decompressed
+once, into memory (up to *decompressMemoryLimit* bytes, and then into a
+temporary file).  Only uncompressed files given by name can be memory-mapped.
+File objects are closed by the loaders.  Identifying a file (SniffFormat())
+or reading its header (LoadRadarHeader()) only reads, and decompresses,
+the start of it.
 """
 
 import numpy as np
 import datetime
+import calendar
+import struct
+import bz2
+import gzip
+import shutil
+import tempfile
+import tarfile
+import fnmatch
+import threading
+try :
+    import queue
+except ImportError :
+    import Queue as queue
 from scipy.io import netcdf
-from os.path import basename
+from os.path import basename, isdir, exists, join, abspath
+from os import stat
+from collections import deque
+from multiprocessing.pool import Pool, ThreadPool
+from BRadar.rasterstore import RasterStore, _HEADER_NAME
 
 class WDSSII_Error(Exception) : 
     def __init__(self, typeName) :
@@ -22,11 +53,391 @@ class WDSSII_Error(Exception) :
         return "Unknown WDSSII PAR datatype %s" % (self.badType)
 
 
-def LoadPAR_wdssii(filename) :
+def _moment_request(moments, default) :
+    """
+    Normalize the *moments* argument of the loaders.
+
+    Returns the list of moment names and whether a single moment
+    (rather than a dictionary of moments) should be returned.
+    """
+    if moments is None :
+        return [default], True
+    if isinstance(moments, str) :
+        return [moments], True
+    return list(moments), False
+
+
+# Decompressed files up to this many bytes are kept in memory;
+# larger ones spill over into a temporary file.
+decompressMemoryLimit = 256 * 2**20
+
+# Magic bytes of the whole-file compression formats, and how to
+# decompress a file object of each.
+_compressions = ((b'\x1f\x8b', lambda f : gzip.GzipFile(fileobj=f, mode='rb')),
+                 (b'BZh', lambda f : bz2.BZ2File(f, 'rb')))
+
+
+def _source_name(source) :
+    """
+    Filename of *source*, a filename or a file object ('' if unknown).
+    """
+    if isinstance(source, str) :
+        return source
+    name = getattr(source, 'name', '')
+    return name if isinstance(name, str) else ''
+
+
+def _decompressor(fobj) :
+    """
+    The decompressing reader for the seekable *fobj*, or None if it is
+    not compressed.  The position of *fobj* is left unchanged.
+    """
+    pos = fobj.tell()
+    magic = fobj.read(3)
+    fobj.seek(pos)
+    for prefix, opener in _compressions :
+        if magic.startswith(prefix) :
+            return opener(fobj)
+    return None
+
+
+class _NamedSpool(tempfile.SpooledTemporaryFile) :
+    """
+    A SpooledTemporaryFile that keeps the name of the file that
+    it holds, for the loaders that look at the filename.
+    """
+    def __init__(self, name, max_size) :
+        tempfile.SpooledTemporaryFile.__init__(self, max_size=max_size)
+        self._sourceName = name
+
+    @property
+    def name(self) :
+        return self._sourceName
+
+
+def _spool(stream, name=None) :
+    """
+    Copy *stream* into a new seekable file, in memory up to
+    *decompressMemoryLimit* bytes, or else on disk.
+
+    The new file is *name*d after *stream* by default.
+    """
+    if name is None :
+        name = _source_name(stream)
+    spool = _NamedSpool(name, decompressMemoryLimit)
+    shutil.copyfileobj(stream, spool, 2**20)
+    spool.seek(0)
+    return spool
+
+
+def _open_source(source) :
+    """
+    Prepare *source*, a filename or a file-like object, for reading,
+    undoing any gzip or bzip2 compression of the whole file.
+
+    Returns the filename itself for uncompressed files (so that they
+    can be memory-mapped), or else a seekable file object.  Compressed
+    data is decompressed once, straight into memory (see
+    *decompressMemoryLimit*), with no temporary file in between.
+    """
+    if isinstance(source, str) :
+        with open(source, 'rb') as f :
+            reader = _decompressor(f)
+            if reader is None :
+                return source
+            with reader :
+                return _spool(reader, source)
+
+    seekable = getattr(source, 'seekable', None)
+    if seekable is None or not seekable() :
+        source = _spool(source)
+
+    reader = _decompressor(source)
+    return source if reader is None else _spool(reader, _source_name(source))
+
+
+def _netcdf_open(source, mmap=None) :
+    """
+    Open *source* (see :func:`_open_source`) as a netcdf file.
+    File objects can not be memory-mapped.  They are closed
+    along with the netcdf file.
+    """
+    source = _open_source(source)
+    if not isinstance(source, str) :
+        mmap = False
+    return netcdf.netcdf_file(source, 'r', mmap=mmap)
+
+
+def _nc_attr(nc, name, default=None) :
+    """
+    Attribute *name* of *nc* (a netcdf file or variable) as a str
+    (or the number itself).  scipy gives text attributes as bytes
+    on Python 3.
+    """
+    value = nc._attributes.get(name, default)
+    if isinstance(value, bytes) :
+        value = value.decode('latin-1')
+    return value
+
+
+class _PartReader(object) :
+    def __init__(self, source) :
+        """
+        Read parts of *source*, a filename or a seekable file object,
+        undoing any gzip or bzip2 compression of the whole file, but
+        without decompressing (or copying) any more of it than is read.
+
+        A file object is left at its current position by :meth:`close`.
+        """
+        if isinstance(source, str) :
+            self._fobj = open(source, 'rb')
+            self._start = None
+        else :
+            self._fobj = source
+            self._start = source.tell()
+        self._reader = _decompressor(self._fobj)
+        self._data = b''
+
+    def head(self, size) :
+        """
+        The first *size* bytes (fewer if the file is shorter).
+        """
+        if size > len(self._data) :
+            if self._reader is None :
+                self._fobj.seek(len(self._data) + (self._start or 0))
+                more = self._fobj.read(size - len(self._data))
+            else :
+                more = self._reader.read(size - len(self._data))
+            self._data += more
+        return self._data[:size]
+
+    def read_at(self, offset, size) :
+        """
+        *size* bytes at *offset*.  Past what :meth:`head` has read,
+        compressed files can only be read forward (skipping ahead
+        still decompresses, but does not keep, the data in between).
+        """
+        if offset + size <= len(self._data) :
+            return self._data[offset:offset + size]
+        if self._reader is None :
+            self._fobj.seek(offset + (self._start or 0))
+            return self._fobj.read(size)
+        self._reader.seek(offset)
+        return self._reader.read(size)
+
+    def close(self) :
+        if self._reader is not None :
+            # Leaves the file object that it reads open.
+            self._reader.close()
+        if self._start is None :
+            self._fobj.close()
+        else :
+            self._fobj.seek(self._start)
+
+
+# Largest netcdf header (in bytes) that is read before giving up on the
+# file as corrupt, so that a bad header never reads in the whole file.
+_MAX_HEADER_SIZE = 4 * 2**20
+
+# netcdf-3 type codes and the data type of each
+_NC_TYPES = {1: 'i1', 2: 'S1', 3: '>i2', 4: '>i4', 5: '>f4', 6: '>f8'}
+
+
+class _NetcdfVarHeader(object) :
+    def __init__(self, dimensions, shape, isrec, attributes, dtype,
+                 begin, vsize) :
+        self.dimensions = dimensions
+        self.shape = shape
+        self.isrec = isrec
+        self._attributes = attributes
+        self.dtype = dtype
+        self.begin = begin
+        self.vsize = vsize
+
+
+class _NetcdfHeader(object) :
+    def __init__(self, reader, size=8192) :
+        """
+        Parse the header of the netcdf-3 file of :class:`_PartReader`
+        *reader*, from as little of the start of the file as it needs
+        (at most *_MAX_HEADER_SIZE* bytes).
+
+        Like a :class:`netcdf.netcdf_file`, this has the `dimensions`,
+        global `_attributes` and `variables` of the file, but no data.
+        See :meth:`read_var`.
+        """
+        while True :
+            self._buf = reader.head(size)
+            self._pos = 0
+            try :
+                self._parse()
+                break
+            except EOFError :
+                if len(self._buf) < size :
+                    raise ValueError("Truncated netcdf header")
+                if size >= _MAX_HEADER_SIZE :
+                    raise ValueError("netcdf header is larger than %d bytes"
+                                     % _MAX_HEADER_SIZE)
+                size = min(size * 4, _MAX_HEADER_SIZE)
+        del self._buf
+
+    def _take(self, size) :
+        if self._pos + size > len(self._buf) :
+            raise EOFError()
+        chunk = self._buf[self._pos:self._pos + size]
+        # Everything is padded to 4-byte boundaries.
+        self._pos += -(-size // 4) * 4
+        return chunk
+
+    def _int(self) :
+        return struct.unpack('>i', self._take(4))[0]
+
+    def _name(self) :
+        return self._take(self._int()).decode('latin-1')
+
+    def _list(self) :
+        tag = self._int()
+        count = self._int()
+        return count if tag else 0
+
+    def _attrs(self) :
+        attrs = {}
+        for _ in range(self._list()) :
+            name = self._name()
+            dtype = np.dtype(_NC_TYPES[self._int()])
+            count = self._int()
+            raw = self._take(count * dtype.itemsize)
+            if dtype.char == 'S' :
+                value = raw.rstrip(b'\x00')
+            else :
+                value = np.frombuffer(raw, dtype=dtype)
+                if len(value) == 1 :
+                    value = value[0]
+            attrs[name] = value
+        return attrs
+
+    def _parse(self) :
+        magic = self._take(4)
+        if magic not in (b'CDF\x01', b'CDF\x02') :
+            raise ValueError("Not a netcdf-3 file")
+        self.numrecs = self._int()
+
+        dims = []
+        for _ in range(self._list()) :
+            name = self._name()
+            dims.append((name, self._int() or None))
+        self.dimensions = dict(dims)
+        self._attributes = self._attrs()
+
+        self.variables = {}
+        for _ in range(self._list()) :
+            name = self._name()
+            dimNames = tuple(dims[self._int()][0] for
+                             _ in range(self._int()))
+            attrs = self._attrs()
+            dtype = np.dtype(_NC_TYPES[self._int()])
+            vsize = self._int()
+            begin = (self._int() if magic == b'CDF\x01' else
+                     struct.unpack('>q', self._take(8))[0])
+            isrec = (len(dimNames) > 0 and
+                     self.dimensions[dimNames[0]] is None)
+            shape = tuple(self.numrecs if self.dimensions[dim] is None else
+                          self.dimensions[dim] for dim in dimNames)
+            self.variables[name] = _NetcdfVarHeader(dimNames, shape, isrec,
+                                                    attrs, dtype, begin,
+                                                    vsize)
+
+    def read_var(self, reader, name) :
+        """
+        The data of the variable *name*, read with *reader*.  Only its
+        own bytes are read (one record at a time, for record variables).
+        """
+        var = self.variables[name]
+        if not var.isrec :
+            size = int(np.prod(var.shape)) * var.dtype.itemsize
+            return np.frombuffer(reader.read_at(var.begin, size),
+                                 dtype=var.dtype).reshape(var.shape)
+
+        recVars = [other for other in self.variables.values() if
+                   other.isrec]
+        size = int(np.prod(var.shape[1:])) * var.dtype.itemsize
+        # A lone record variable is not padded between records.
+        recSize = (size if len(recVars) == 1 else
+                   sum(other.vsize for other in recVars))
+        return np.frombuffer(b''.join(reader.read_at(var.begin +
+                                                     index * recSize, size)
+                                      for index in range(var.shape[0])),
+                             dtype=var.dtype).reshape(var.shape)
+
+
+def ReorderRadials(data, order, inplace=False) :
+    """
+    Reorder the radials of each scan of *data* in one batched gather.
+
+    *data*      Array of shape (scan, radial, ...), or (radial, ...)
+                for a single scan.
+
+    *order*     Integer array of shape (scan, radial) (or (radial,))
+                giving, for each scan, the radials in their new order.
+                For example, np.argsort(azimuths) to sort by azimuth.
+
+    *inplace*   If True, the result is written back into *data*
+                (which must be writable) instead of a new array.
+
+    Returns the reordered array.
+    """
+    if not inplace :
+        data = np.asarray(data)
+    order = np.asarray(order)
+    if order.ndim == 1 :
+        if inplace :
+            np.take(data, order, axis=0, out=data)
+            return data
+        return data[order]
+
+    scanCnt, radialCnt = order.shape
+    # Index of each radial into the (scan * radial, ...) flattened data
+    flatOrder = (order + radialCnt *
+                 np.arange(scanCnt)[:, np.newaxis]).ravel()
+    flatShape = (scanCnt * radialCnt,) + data.shape[2:]
+
+    if not inplace :
+        return np.take(data.reshape(flatShape), flatOrder,
+                       axis=0).reshape(data.shape)
+
+    flatData = data.reshape(flatShape)
+    if np.may_share_memory(flatData, data) :
+        # np.take() buffers the output when mode='raise' (the default),
+        # so writing back into the same memory is safe.
+        np.take(flatData, flatOrder, axis=0, out=flatData)
+    else :
+        # *data* isn't contiguous, so reshaping made a copy.
+        data[...] = np.take(flatData, flatOrder,
+                            axis=0).reshape(data.shape)
+    return data
+
+
+def LoadPAR_wdssii(filename, compact=False, sparse=False) :
     """
     This loader will retreive the radar moments data obtained
     from the wdssii.arrc.nor.ouint computer
 
+    *compact*       If True, 'azimuth' is returned as an (azi, 1) array
+                    and 'range_gate' as a (1, range) array (or as the full
+                    (azi, range) array if the gate widths vary by radial).
+
+    *sparse*        If True, only the valid gates are returned: 'vals',
+                    'azimuth' and 'range_gate' are parallel 1-D arrays
+                    (which can go straight into :func:`Rastify`), and
+                    the extra keys 'pixel_x' and 'pixel_y' (the azimuth
+                    and range indices of each gate) and 'shape' (the
+                    full (azi, range) shape) are added.  For
+                    'SparseRadialSet' files, this never builds the
+                    full array.  *compact* is ignored.
+
+    Otherwise, 'SparseRadialSet' data are filled into a float32 array
+    of NaNs.
+
     Returns a dictionary with the following keys:
         'vals'
         'azimuth'       [degrees North]
@@ -39,9 +450,9 @@ def LoadPAR_wdssii(filename) :
         'gate_length'   [m]
         'beam_width'    [degrees]
     """
-    nc = netcdf.netcdf_file(filename, 'r')
+    nc = _netcdf_open(filename)
 
-    varName = nc.TypeName
+    varName = _nc_attr(nc, 'TypeName')
     
     azimuths = nc.variables['Azimuth'][:]
     gateWidths = nc.variables['GateWidth'][:]
@@ -59,7 +470,7 @@ def LoadPAR_wdssii(filename) :
     aziLen = None
     rangeLen = None
 
-    dataType = nc.DataType
+    dataType = _nc_attr(nc, 'DataType')
 
     if (dataType == 'SparseRadialSet') :
         rawParData = nc.variables[varName][:]
@@ -69,23 +480,52 @@ def LoadPAR_wdssii(filename) :
         aziLen = azimuths.shape[0]
         rangeLen = (yLoc.max() + 1) if len(yLoc) > 0 else 0
 
-        parData = np.empty((aziLen, rangeLen))
-        parData.fill(np.nan)
-        parData[xLoc, yLoc] = rawParData
+        if not sparse :
+            parData = np.empty((aziLen, rangeLen), dtype=np.float32)
+            parData.fill(np.nan)
+            parData[xLoc, yLoc] = rawParData
 
     elif (dataType == 'RadialSet') :
         parData = np.array(nc.variables[varName][:])
 
         (aziLen, rangeLen) = parData.shape
+        if sparse :
+            (xLoc, yLoc) = np.nonzero(~np.isnan(parData))
+            rawParData = parData[xLoc, yLoc]
 
     else :
         nc.close()
         raise WDSSII_Error(dataType)
 
-    
-    rangeGrid = nc.RangeToFirstGate + (np.arange(rangeLen)[np.newaxis, :] * 
-						               gateWidths[:, np.newaxis])
-    aziGrid = np.tile(azimuths, (rangeLen, 1)).T
+    gateLength = np.median(gateWidths)
+    if sparse :
+        good = (rawParData != missingData) & (rawParData != rangeFolded)
+        xLoc = np.asarray(xLoc)[good]
+        yLoc = np.asarray(yLoc)[good]
+        radData = {'vals': np.asarray(rawParData, dtype=np.float32)[good],
+                   'azimuth': azimuths[xLoc],
+                   'range_gate': (nc.RangeToFirstGate +
+                                  yLoc * gateWidths[xLoc]),
+                   'pixel_x': xLoc, 'pixel_y': yLoc,
+                   'shape': (aziLen, rangeLen),
+                   'elev_angle': elevAngle,
+                   'stat_lat': statLat, 'stat_lon': statLon,
+                   'scan_time': scanTime, 'var_name': varName,
+                   'gate_length': gateLength,
+                   'beam_width': np.median(beamWidths)}
+        nc.close()
+        return radData
+
+    if compact :
+        if np.all(gateWidths == gateWidths[0]) :
+            gateWidths = gateWidths[:1]
+        rangeGrid = nc.RangeToFirstGate + (np.arange(rangeLen)[np.newaxis, :] *
+                                           gateWidths[:, np.newaxis])
+        aziGrid = azimuths[:, np.newaxis]
+    else :
+        rangeGrid = nc.RangeToFirstGate + (np.arange(rangeLen)[np.newaxis, :] * 
+						                   gateWidths[:, np.newaxis])
+        aziGrid = np.tile(azimuths, (rangeLen, 1)).T
 
     # TODO: Maybe we should be using masks?
     parData[(parData == missingData) | (parData == rangeFolded)] = np.nan
@@ -97,18 +537,34 @@ def LoadPAR_wdssii(filename) :
             'elev_angle': elevAngle,
 	        'stat_lat': statLat, 'stat_lon': statLon,
 	        'scan_time': scanTime, 'var_name': varName,
-    	    'gate_length': np.median(gateWidths),
+    	    'gate_length': gateLength,
             'beam_width': np.median(beamWidths)}
 
 
 
-# TODO: Maybe adjust the code so that a parameterized version of this function can choose
-#       which moment(s) to calculate from the data?
-def LoadPAR_lipn(filename) :
+# The moments that LoadPAR_lipn() can compute.
+_LIPN_MOMENTS = ('Reflectivity', 'RadialVelocity', 'SpectrumWidth')
+
+def LoadPAR_lipn(filename, compact=False, moments=None) :
     """
-    This function will load the radar data from a "Level-I Plus" file and produce Reflectivity moments.
+    This function will load the radar data from a "Level-I Plus" file and produce
+    Reflectivity, RadialVelocity and/or SpectrumWidth moments.
     These files were generated by Boon Leng Cheong's program to process PAR data streams.
 
+    *compact*       If True, 'azimuth' is returned as an (azi, 1) array
+                    and 'range_gate' as a (1, range) array.
+
+    *moments*       Name of the moment to compute ('Reflectivity',
+                    'RadialVelocity' or 'SpectrumWidth').  Default is
+                    'Reflectivity'.  If a list of names is given, all of
+                    them are computed from one read of the lag arrays,
+                    and a dictionary of the results, keyed by name,
+                    is returned.
+
+    Gates with a signal-to-noise ratio below 5 (linear) are NaN
+    for all moments.  The velocity and spectrum width are the pulse-pair
+    estimates from the lag-0 (R0) and lag-1 (R1) autocorrelations.
+
     Returns a dictionary with the following keys:
         'vals'
         'azimuth'
@@ -121,25 +577,52 @@ def LoadPAR_lipn(filename) :
         'gate_length'
         'beam_width'
     """
-    nc = netcdf.netcdf_file(filename, 'r')
+    names, single = _moment_request(moments, 'Reflectivity')
+    for name in names :
+        if name not in _LIPN_MOMENTS :
+            raise ValueError("Unknown LIPN moment: %s" % name)
+
+    nc = _netcdf_open(filename)
       
-    varName = 'Reflectivity'
     azimuths = nc.variables['Azimuth'][:]
     ranges = nc.variables['Range'][:] * 1000.0    # convert to meters from km
 
     R0 = nc.variables['R0'][:]
-    #R1 = nc.variables['R1_real'][:] + nc.variables['R1_imag'][:] * 1j
-    #specWidth = np.sqrt(np.abs(np.log(np.abs(R0./R1)))) 
-    #            * np.sign(np.log(np.abs(R0./R1))) 
-    #            * (nc.Lambda / (2*np.sqrt(6)*np.pi*nc.PRT))
+    noiseFloor = nc.NoiseFloor
     noiseThresh = 5.0
-    parData = np.where(R0 / nc.NoiseFloor < noiseThresh,
-                       np.nan,
-                       (10*np.log10(R0 / nc.NoiseFloor) +
-                        20*np.log10(ranges[np.newaxis, :] / 1000.0) +
-                        nc.SNRdBtodBZ))
 
-    (rangeGrid, aziGrid) = np.meshgrid(ranges, azimuths)
+    # Shared by all of the moments
+    snr = R0 / noiseFloor
+    noisy = snr < noiseThresh
+
+    momentData = {}
+    if 'Reflectivity' in names :
+        momentData['Reflectivity'] = (10*np.log10(snr) +
+                                      20*np.log10(ranges[np.newaxis, :] / 1000.0) +
+                                      nc.SNRdBtodBZ)
+
+    if 'RadialVelocity' in names or 'SpectrumWidth' in names :
+        R1 = nc.variables['R1_real'][:] + nc.variables['R1_imag'][:] * 1j
+        # lambda / (4 pi T), the Nyquist velocity over pi
+        velScale = nc.Lambda / (4 * np.pi * nc.PRT)
+
+        if 'RadialVelocity' in names :
+            # Positive away from the radar
+            momentData['RadialVelocity'] = -velScale * np.angle(R1)
+
+        if 'SpectrumWidth' in names :
+            # Signal power over the magnitude of R1
+            with np.errstate(divide='ignore', invalid='ignore') :
+                logRatio = np.log((R0 - noiseFloor) / np.abs(R1))
+            momentData['SpectrumWidth'] = (velScale * np.sqrt(2) *
+                                           np.sqrt(np.abs(logRatio)) *
+                                           np.sign(logRatio))
+
+    if compact :
+        rangeGrid = ranges[np.newaxis, :]
+        aziGrid = azimuths[:, np.newaxis]
+    else :
+        (rangeGrid, aziGrid) = np.meshgrid(ranges, azimuths)
 
     gateLength = nc.GateSize
       
@@ -150,20 +633,119 @@ def LoadPAR_lipn(filename) :
       
     nc.close()
 
-    return {'vals': parData,
-	        'azimuth': aziGrid, 'range_gate': rangeGrid,
-            'elev_angle': elevAngle,
-	        'stat_lat': statLat, 'stat_lon': statLon,
-            'scan_time': scanTime, 'var_name': varName,
-	        'gate_length': gateLength,
-            'beam_width': 1.0}
+    results = {}
+    for varName in names :
+        parData = momentData[varName]
+        parData[noisy] = np.nan
+        results[varName] = {'vals': parData,
+                            'azimuth': aziGrid, 'range_gate': rangeGrid,
+                            'elev_angle': elevAngle,
+                            'stat_lat': statLat, 'stat_lon': statLon,
+                            'scan_time': scanTime, 'var_name': varName,
+                            'gate_length': gateLength,
+                            'beam_width': 1.0}
+
+    return results[names[0]] if single else results
+
+class ScaledArray(object) :
+    def __init__(self, raw, scale_factor, add_offset, missing=()) :
+        """
+        Array-like wrapper of the packed integer data *raw* of a moment,
+        where the physical value is raw * scale_factor + add_offset, and
+        the raw codes in *missing* mark missing data.
+
+        Nothing is decoded until the array is indexed, and then only
+        the requested slice is decoded into floats (with NaNs for the
+        missing codes).  The raw data, *scale_factor*, *add_offset*
+        and *missing* are all available as attributes, so that work
+        like thresholding can be done on the integers instead (see
+        :meth:`valid_mask` and :meth:`raw_threshold`).
+        """
+        self.raw = raw
+        self.scale_factor = scale_factor
+        self.add_offset = add_offset
+        self.missing = np.atleast_1d(missing)
+        self.shape = raw.shape
+        self.dtype = np.dtype(float)
+
+    @property
+    def ndim(self) :
+        return len(self.shape)
+
+    @property
+    def size(self) :
+        return int(np.prod(self.shape))
+
+    def __len__(self) :
+        return self.shape[0]
+
+    def decode(self, raw) :
+        """
+        Decode an array of raw integers from this moment.
+        """
+        raw = np.asarray(raw)
+        vals = raw * self.scale_factor + self.add_offset
+        if len(self.missing) > 0 :
+            vals = np.where(np.isin(raw, self.missing), np.nan, vals)
+        return vals
+
+    def __getitem__(self, index) :
+        return self.decode(self.raw[index])
 
-def LoadLevel2(filename) :
+    def __array__(self, dtype=None, copy=None) :
+        vals = self[...]
+        return vals if dtype is None else vals.astype(dtype)
+
+    def valid_mask(self, index=Ellipsis) :
+        """
+        Boolean mask of the data that are not missing.
+        """
+        raw = np.asarray(self.raw[index])
+        return ~np.isin(raw, self.missing)
+
+    def raw_threshold(self, value) :
+        """
+        The smallest raw code whose decoded value is at least *value*
+        (assuming a positive *scale_factor*).  So, for the valid data,
+        ``raw >= raw_threshold(value)`` is the same as
+        ``decoded >= value``.
+        """
+        return np.ceil((value - self.add_offset) / self.scale_factor)
+
+
+def LoadLevel2(filename, sweeps=None, moments=None, max_range=None,
+               decode=True) :
     """
     This function will load the netcdf export of a Level II radar
     data file.  The netcdf file assumes the "_Coordinates" convention
     with the "ARCHIVE2" format and "RADIAL" cdm_data_type.
 
+    *sweeps*        Index (or list of indices) of the sweeps to load.
+                    Default is to load all sweeps.
+
+                    Note that the index is into each moment's own scan
+                    dimension (e.g., 'scanR' for Reflectivity and 'scanV'
+                    for RadialVelocity), and the moments are not always
+                    collected on the same tilts.  So, when loading several
+                    moments, the same index can be a different elevation
+                    angle for each of them.  Check their 'elev_angle'.
+
+    *moments*       Name of the moment variable to load
+                    (e.g., 'Reflectivity', 'RadialVelocity',
+                    'SpectrumWidth').  Default is 'Reflectivity'.
+                    If a list of names is given, then a dictionary
+                    of the results, keyed by name, is returned.
+
+    *max_range*     Only load the gates out to this range [m].
+                    Default is to load all gates.
+
+    *decode*        If False, 'vals' is a :class:`ScaledArray` of the
+                    raw integers in the file (1/8th of the memory of the
+                    decoded data), which decodes slices on demand.
+
+    Only the requested parts of the data variables are read from the
+    file and decoded.  The missing value codes are decoded to NaNs.
+
     Returns a dictionary with the following keys:
         'vals'
         'azimuth'
@@ -175,70 +757,378 @@ def LoadLevel2(filename) :
         'var_name'
         'gate_length'
         'beam_width'
+        'station'
     """
     from BRadar.radarsites import ByName
 
-    nc = netcdf.netcdf_file(filename, 'r')
-
-    varName = 'Reflectivity'
-    azimuths = nc.variables['azimuthR'][:]      # (scanR, radialR)
-    ranges = nc.variables['distanceR'][:]       # (gateR)  already in meters
-    elevAngle = nc.variables['elevationR'][:]   # (scanR, radialR)
+    names, single = _moment_request(moments, 'Reflectivity')
 
-    # Each scan is a different elevation angle, but elevationR
-    # records a higher precision elevation angle for each dwell.
-    # We don't need that.
-    # elevAngle will be 3-D, (elev, azi, range)
-    elevAngle = np.mean(elevAngle, axis=1)[:, np.newaxis, np.newaxis]
-    
-    aziArgs = np.argsort(azimuths)      # Sort the azimuths for each scan
-    # azimuths is 3-D (elev, azi, range)
-    azimuths = np.array([azimuths[scan, aziArgs[scan, :]] for
-                         scan in range(azimuths.shape[0])])[..., np.newaxis]
-
-
-    if nc.variables[varName]._Unsigned == 'true' :
-        datavals = nc.variables[varName][:].view(dtype=np.uint8)
+    if sweeps is None :
+        scanSel = slice(None)
     else :
-        datavals = nc.variables[varName][:]
-
-    varData = ((datavals *
-                nc.variables[varName].scale_factor) +
-               nc.variables[varName].add_offset)     # (scanR, radialR, gateR)
-    #varData = np.where(datavals == nc.variables[varName].missing_value[0]
-    #                  |datavals == nc.variables[varName].missing_value[1],
-    #                   np.nan, varData) 
+        scanSel = np.atleast_1d(sweeps)
 
-    # re-arrange varData that it is 3-D (elev, azi, range)
-    varData = np.array([varData[scan, aziArgs[scan, :], :] for
-                        scan in range(varData.shape[0])])
+    nc = _netcdf_open(filename)
 
     # TODO: Temporary kludge until the station name is fixed in the file.
-    siteLoc = ByName(basename(filename)[0:4])
+    station = basename(_source_name(filename))[0:4]
+    siteLoc = ByName(station)
 
     statLat = siteLoc[0]['LAT']
     statLon = siteLoc[0]['LON']
-    gateLength = np.median(np.diff(ranges))
-    scanTime = datetime.datetime.strptime(nc.time_coverage_start, "%Y-%m-%dT%H:%M:%SZ")
+    scanTime = datetime.datetime.strptime(_nc_attr(nc, 'time_coverage_start'),
+                                          "%Y-%m-%dT%H:%M:%SZ")
     # Yes, I know it is spelled wrong, but this is how it is spelled in the metadata...
     beamWidth = nc.HorizonatalBeamWidthInDegrees
+
+    results = {}
+    for varName in names :
+        var = nc.variables[varName]
+        # The coordinate variables have the same suffix as the
+        # variable's scan dimension (e.g., 'scanR' -> 'azimuthR').
+        suffix = var.dimensions[0][len('scan'):]
+
+        ranges = nc.variables['distance' + suffix][:]     # already in meters
+        # From all of the gates, in case max_range leaves only one.
+        gateLength = np.median(np.diff(ranges))
+        gateSel = slice(None)
+        if max_range is not None :
+            gateSel = slice(0, np.searchsorted(ranges, max_range,
+                                               side='right'))
+        ranges = ranges[gateSel]
+
+        # The variables are memory-mapped, so only the
+        # selected hyperslabs are actually read.
+        azimuths = nc.variables['azimuth' + suffix][scanSel]  # (scan, radial)
+        elevAngle = nc.variables['elevation' + suffix][scanSel]
+
+        # Each scan is a different elevation angle, but elevationR
+        # records a higher precision elevation angle for each dwell.
+        # We don't need that.
+        # elevAngle will be 3-D, (elev, azi, range)
+        elevAngle = np.mean(elevAngle, axis=1)[:, np.newaxis, np.newaxis]
+
+        aziArgs = np.argsort(azimuths)      # Sort the azimuths for each scan
+        # azimuths is 3-D (elev, azi, range)
+        azimuths = ReorderRadials(azimuths, aziArgs)[..., np.newaxis]
+
+        datavals = var.data[scanSel, :, gateSel]
+        missing = np.atleast_1d(getattr(var, 'missing_value',
+                                        [])).astype(var.data.dtype)
+        if _nc_attr(var, '_Unsigned', 'false') == 'true' :
+            datavals = datavals.view(dtype=np.uint8)
+            missing = missing.view(dtype=np.uint8)
+
+        if decode :
+            varData = ScaledArray(datavals, var.scale_factor,
+                                  var.add_offset, missing)[...]
+            # re-arrange varData that it is 3-D (elev, azi, range)
+            # varData is a fresh array, so it is safe to sort it in place.
+            ReorderRadials(varData, aziArgs, inplace=True)
+        else :
+            # The raw data may be a view of the memory-mapped file,
+            # so don't sort it in place.
+            varData = ScaledArray(ReorderRadials(datavals, aziArgs),
+                                  var.scale_factor, var.add_offset,
+                                  missing)
+
+        results[varName] = {'vals': varData,
+                            'azimuth': azimuths,
+                            'range_gate': ranges[np.newaxis, np.newaxis, :],
+                            'elev_angle': elevAngle,
+                            'stat_lat': statLat, 'stat_lon': statLon,
+                            'scan_time': scanTime, 'var_name': varName,
+                            'gate_length': gateLength,
+                            'beam_width': beamWidth, 'station': station}
+
     nc.close()
 
-    return {'vals': varData,
-            'azimuth': azimuths,
-            'range_gate': ranges[np.newaxis, np.newaxis, :],
-            'elev_angle': elevAngle,
-            'stat_lat': statLat, 'stat_lon': statLon,
-            'scan_time': scanTime, 'var_name': varName,
-            'gate_length': gateLength,
-            'beam_width': beamWidth}
+    return results[names[0]] if single else results
+
+
+# Archive II (NEXRAD Level II) format details.  See the Interface Control
+# Document for the RDA/RPG (2620002) and for Archive II/User (2620010).
+_AR2_VOLUME_HEADER = struct.Struct('>9s3sII4s')    # 24 bytes
+_AR2_CTM_SIZE = 12                  # Channel terminal manager bytes
+_AR2_MSG_HEADER = struct.Struct('>HBBHHIHH')       # 16 bytes
+_AR2_SEGMENT_SIZE = 2432            # Fixed size of non-Message 31 records
+_AR2_MSG31_HEADER = struct.Struct('>4sIHHfBBHBBBBfBBH')   # 32 bytes
+_AR2_MOMENT_HEADER = struct.Struct('>4sIHHHhhBBff')  # 28 bytes
+_AR2_VOL_BLOCK = struct.Struct('>4sHBBffhH')       # first 20 bytes
+
+# Long names (as used by the netcdf exports) of the Message 31 moments.
+_AR2_MOMENTS = {'Reflectivity': 'REF',
+                'RadialVelocity': 'VEL',
+                'SpectrumWidth': 'SW ',
+                'DifferentialReflectivity': 'ZDR',
+                'DifferentialPhase': 'PHI',
+                'CorrelationCoefficient': 'RHO',
+                'ClutterFilterPowerRemoved': 'CFP'}
+
+# Nominal WSR-88D beam width.  Message 31 does not carry it.
+_WSR88D_BEAM_WIDTH = 0.95
+
+
+def _archive2_body(filename) :
+    """
+    Read an Archive II file, undoing any gzip or bzip2 compression
+    of the whole file.
+
+    Returns the volume header tuple and the message stream.
+    """
+    source = _open_source(filename)
+    if isinstance(source, str) :
+        with open(source, 'rb') as f :
+            raw = f.read()
+    else :
+        raw = source.read()
+        source.close()
+
+    volHeader = _AR2_VOLUME_HEADER.unpack_from(raw, 0)
+    if not volHeader[0].startswith(b'AR2V') :
+        raise ValueError("Not an Archive II file: %s" % filename)
+
+    pos = _AR2_VOLUME_HEADER.size
+    if raw[pos + 4:pos + 6] != b'BZ' :
+        return volHeader, raw[pos:]
+
+    # LDM records: a 4-byte size (negative for the last record of the
+    # volume) followed by that many bytes of bzip2 data.
+    records = []
+    while pos + 4 <= len(raw) :
+        size = abs(struct.unpack_from('>i', raw, pos)[0])
+        if size == 0 :
+            break
+        records.append(bz2.decompress(raw[pos + 4:pos + 4 + size]))
+        pos += 4 + size
+
+    return volHeader, b''.join(records)
+
+
+def _archive2_radials(body, blockNames) :
+    """
+    Find the Message 31 radials in the message stream *body*.
+
+    Returns the list of radial header tuples, the VOL block tuple
+    (or None), and for each name in *blockNames* a list (parallel to the
+    radials) of (moment header tuple, data offset), or None if the
+    radial doesn't have that moment.
+    """
+    headers = []
+    volBlock = None
+    moments = dict((name, []) for name in blockNames)
+
+    pos = 0
+    while pos + _AR2_CTM_SIZE + _AR2_MSG_HEADER.size <= len(body) :
+        msgHeader = _AR2_MSG_HEADER.unpack_from(body, pos + _AR2_CTM_SIZE)
+        if msgHeader[2] != 31 :
+            pos += _AR2_SEGMENT_SIZE
+            continue
+
+        # Block pointers are relative to the start of the data header.
+        start = pos + _AR2_CTM_SIZE + _AR2_MSG_HEADER.size
+        header = _AR2_MSG31_HEADER.unpack_from(body, start)
+        pointers = struct.unpack_from('>%dI' % header[-1], body,
+                                      start + _AR2_MSG31_HEADER.size)
+        radMoments = dict((name, None) for name in blockNames)
+        for pointer in pointers :
+            blockName = body[start + pointer:start + pointer + 4]
+            if blockName == b'RVOL' :
+                if volBlock is None :
+                    volBlock = _AR2_VOL_BLOCK.unpack_from(body,
+                                                          start + pointer)
+            elif blockName[1:].decode('ascii') in radMoments :
+                radMoments[blockName[1:].decode('ascii')] = (
+                    _AR2_MOMENT_HEADER.unpack_from(body, start + pointer),
+                    start + pointer + _AR2_MOMENT_HEADER.size)
+
+        headers.append(header)
+        for name in blockNames :
+            moments[name].append(radMoments[name])
+
+        # The message size is in halfwords, counted from the message header.
+        pos += _AR2_CTM_SIZE + 2 * msgHeader[0]
+
+    return headers, volBlock, moments
+
+
+def _decode_sweep(buf, blocks) :
+    """
+    Decode the moment data of one sweep's radials in one shot.
+
+    *buf*       The message stream as a uint8 array.
+    *blocks*    List of (moment header, data offset) for each radial.
+
+    Returns a float32 array (radials, gates) with NaNs for the
+    below-threshold and range-folded codes (0 and 1), and for the
+    gates past the end of shorter radials.
+    """
+    gateCounts = np.array([block[0][2] for block in blocks])
+    wordSize = blocks[0][0][8] // 8
+    scales = np.array([block[0][9] for block in blocks])[:, np.newaxis]
+    offsets = np.array([block[0][10] for block in blocks])[:, np.newaxis]
+    starts = np.array([block[1] for block in blocks])
+
+    maxGates = gateCounts.max()
+    byteIndex = (starts[:, np.newaxis] +
+                 np.arange(maxGates * wordSize)[np.newaxis, :])
+    np.clip(byteIndex, 0, len(buf) - 1, out=byteIndex)
+    raw = buf[byteIndex]
+    if wordSize == 2 :
+        raw = raw.view('>u2')
+
+    vals = ((raw - offsets) / scales).astype(np.float32)
+    vals[(raw <= 1) |
+         (np.arange(maxGates)[np.newaxis, :] >= gateCounts[:, np.newaxis])
+         ] = np.nan
+    return vals
+
+
+def LoadArchive2(filename, moments=None) :
+    """
+    This function will load a raw NEXRAD Level II (Archive II) file,
+    such as the ones distributed through LDM and the NCDC archives.
+    Both the bzip2-compressed (LDM) and uncompressed files can be read,
+    but only the Message 31 format (Build 10 and later) is supported.
+
+    *moments*       The moment to load.  Either the netcdf names
+                    ('Reflectivity', 'RadialVelocity', 'SpectrumWidth',
+                    'DifferentialReflectivity', 'DifferentialPhase',
+                    'CorrelationCoefficient', 'ClutterFilterPowerRemoved')
+                    or the Message 31 names ('REF', 'VEL', 'SW', ...).
+                    Default is 'Reflectivity'.  If a list of moments
+                    is given, they are all decoded from a single read of
+                    the file and a dictionary of the results, keyed by
+                    the requested names, is returned.
+
+    Like :func:`LoadLevel2`, the data is 3-D (elev, azi, range), with the
+    azimuths of each sweep sorted.  Only the sweeps that have the moment
+    are included, and sweeps with fewer radials or gates are padded with
+    NaNs.  The data is float32.
+
+    Returns a dictionary with the following keys:
+        'vals'
+        'azimuth'
+        'range_gate'
+        'elev_angle'
+        'stat_lat'
+        'stat_lon'
+        'scan_time'
+        'var_name'
+        'gate_length'
+        'beam_width'
+        'station'
+    """
+    from BRadar.radarsites import ByName
+
+    names, single = _moment_request(moments, 'Reflectivity')
+    blockNames = [_AR2_MOMENTS.get(name, name.ljust(3)) for name in names]
+    for name, blockName in zip(names, blockNames) :
+        if blockName not in _AR2_MOMENTS.values() :
+            raise ValueError("Unknown Level II moment: %s" % name)
+
+    volHeader, body = _archive2_body(filename)
+    headers, volBlock, radMoments = _archive2_radials(body, blockNames)
+    if len(headers) == 0 :
+        raise ValueError("No Message 31 radials found in %s" % filename)
+
+    buf = np.frombuffer(body, dtype=np.uint8)
+    station = headers[0][0].decode('ascii').strip()
+    if volBlock is not None :
+        statLat, statLon = volBlock[4], volBlock[5]
+    else :
+        siteLoc = ByName(station)
+        statLat = siteLoc[0]['LAT']
+        statLon = siteLoc[0]['LON']
+
+    # Julian date (day 1 is 1970-01-01) and milliseconds past midnight
+    scanTime = (datetime.datetime(1969, 12, 31) +
+                datetime.timedelta(days=volHeader[2],
+                                   milliseconds=volHeader[3]))
+
+    elevNums = np.array([header[10] for header in headers])
+    azimuths = np.array([header[4] for header in headers])
+    elevAngles = np.array([header[12] for header in headers])
+
+    results = {}
+    for name, blockName in zip(names, blockNames) :
+        blocks = radMoments[blockName]
+        hasMoment = np.array([block is not None for block in blocks])
+        sweeps = np.unique(elevNums[hasMoment])
+        if len(sweeps) == 0 :
+            raise ValueError("No %s data in %s" % (name, filename))
+
+        sweepRadials = []
+        for sweep in sweeps :
+            radials = np.flatnonzero(hasMoment & (elevNums == sweep))
+            # Gather the radials in azimuthal order.
+            sweepRadials.append(radials[np.argsort(azimuths[radials])])
+
+        maxRadials = max(len(radials) for radials in sweepRadials)
+        maxGates = max(blocks[radial][0][2] for radial in
+                       np.concatenate(sweepRadials))
+
+        varData = np.empty((len(sweeps), maxRadials, maxGates),
+                           dtype=np.float32)
+        varData.fill(np.nan)
+        sweepAzimuths = np.empty((len(sweeps), maxRadials, 1))
+        sweepAzimuths.fill(np.nan)
+        for index, radials in enumerate(sweepRadials) :
+            sweepData = _decode_sweep(buf, [blocks[radial] for
+                                            radial in radials])
+            varData[index, :len(radials), :sweepData.shape[1]] = sweepData
+            sweepAzimuths[index, :len(radials), 0] = azimuths[radials]
+
+        elevAngle = np.array([elevAngles[radials].mean() for
+                              radials in sweepRadials])
+
+        # The gate geometry is assumed to be the same for every sweep
+        # of a moment.
+        firstBlock = blocks[sweepRadials[0][0]][0]
+        gateLength = float(firstBlock[4])
+        ranges = firstBlock[3] + gateLength * np.arange(maxGates)
+
+        results[name] = {'vals': varData,
+                         'azimuth': sweepAzimuths,
+                         'range_gate': ranges[np.newaxis, np.newaxis, :],
+                         'elev_angle': elevAngle[:, np.newaxis, np.newaxis],
+                         'stat_lat': statLat, 'stat_lon': statLon,
+                         'scan_time': scanTime,
+                         'var_name': (name if name in _AR2_MOMENTS else
+                                      blockName.strip()),
+                         'gate_length': gateLength,
+                         'beam_width': _WSR88D_BEAM_WIDTH,
+                         'station': station}
+
+    return results[names[0]] if single else results
 
                                          
 def SaveRastRadar(filename, rastData, latAxis, lonAxis,
-                  scanTime, varName, station) :
+                  scanTime, varName, station, append=False, writer=None) :
     """
     For saving radar data stored in Lat/Lon coordinates.
+
+    *append*        If True, the file gets an unlimited time dimension,
+                    and if *filename* already exists (from an earlier
+                    call with append=True), the scan is added to the end
+                    of it instead.  The grid and *varName* must match.
+                    Only the new scan is written, so appending does not
+                    slow down as the file grows.
+
+    *writer*        An :class:`AsyncRastWriter`.  If given, the scan is
+                    handed to it, and this returns right away, while the
+                    file is written in the background.
     """
+    if writer is not None :
+        writer.submit(filename, rastData, latAxis, lonAxis,
+                      scanTime, varName, station, append=append)
+        return
+
+    if append and exists(filename) :
+        _append_rast_radar(filename, rastData, latAxis, lonAxis,
+                           scanTime, varName)
+        return
+
     nc = netcdf.netcdf_file(filename, 'w')
     
     # Setting Global Attribute
@@ -247,15 +1137,15 @@ def SaveRastRadar(filename, rastData, latAxis, lonAxis,
     nc.varName = varName
     nc.station = station
     
-    # Setting the dimensions
+    # Setting the dimensions (an unlimited dimension must be the first)
+    nc.createDimension('time', None if append else 1)
     nc.createDimension('lat', len(latAxis))
     nc.createDimension('lon', len(lonAxis))
-    nc.createDimension('time', 1)
     
     # Setting the variables
     valueVar = nc.createVariable('value', 'f', ('time', 'lat', 'lon'))
     valueVar.long_name = 'Rasterized ' + varName
-    valueVar[:] = rastData.reshape((1, len(latAxis), len(lonAxis)))
+    valueVar[0] = rastData.reshape((len(latAxis), len(lonAxis)))
     
     latVar = nc.createVariable('lat', 'f', ('lat',))
     latVar.units = 'degrees_north'
@@ -269,50 +1159,299 @@ def SaveRastRadar(filename, rastData, latAxis, lonAxis,
     
     timeVar = nc.createVariable('time', 'i', ('time',))
     timeVar.units = 'seconds since 1970-1-1'
-    timeVar.assignValue(scanTime)
+    timeVar[0] = scanTime
     
     nc.close()
 
 
-def LoadRastRadar(infilename, force_int=False) :
+def _append_rast_radar(filename, rastData, latAxis, lonAxis,
+                       scanTime, varName) :
+    """
+    Add a scan to the end of a file made by SaveRastRadar(..., append=True).
+
+    In a netcdf-3 file, the records of the unlimited dimension always come
+    last, so a new record is just written at the end of the file, and the
+    record count in the header is updated.
+    """
+    shape = (len(latAxis), len(lonAxis))
+
+    nc = netcdf.netcdf_file(filename, 'r', mmap=True)
+    # (A generator, so that no reference to the mapped data is left behind)
+    recVars = list((name, var.data.dtype.str, var.shape[1:]) for
+                   name, var in nc.variables.items() if var.isrec)
+    fileVar = _nc_attr(nc, 'varName')
+    numRecs = nc.variables['time'].shape[0] if 'time' in nc.variables else 0
+    fileAxes = [np.array(nc.variables[name][:]) if name in nc.variables
+                else None for name in ('lat', 'lon')]
+    nc.close()
+
+    if (nc.dimensions.get('time', 0) is not None or
+        recVars != [('value', '>f4', shape), ('time', '>i4', ())]) :
+        raise ValueError("%s was not made by SaveRastRadar(..., append=True)"
+                         " for this grid" % filename)
+    if fileVar != varName :
+        raise ValueError("Variable %s does not match %s in %s" %
+                         (varName, fileVar, filename))
+    for fileAxis, axis in zip(fileAxes, (latAxis, lonAxis)) :
+        # The axes are stored as 32-bit floats.
+        if (fileAxis is None or fileAxis.shape != np.shape(axis) or
+            not np.allclose(fileAxis, np.asarray(axis, dtype=np.float32))) :
+            raise ValueError("The lat/lon axes do not match the grid"
+                             " in %s" % filename)
+
+    record = (np.asarray(rastData).reshape(shape).astype('>f4').tobytes() +
+              struct.pack('>i', int(scanTime)))
+    with open(filename, 'r+b') as f :
+        f.seek(0, 2)
+        f.write(record)
+        # The record count follows the 4-byte magic number.
+        f.seek(4)
+        f.write(struct.pack('>i', numRecs + 1))
+
+
+class AsyncRastWriter(object) :
+    def __init__(self, workers=1, maxPending=4, copy=True) :
+        """
+        Write rasterized radar files in background threads, so that
+        computing the next scan and writing the last one overlap.
+
+        Use it with SaveRastRadar(..., writer=writer), or :meth:`submit`.
+
+        *workers*       Number of writer threads.  All of the scans for
+                        one file (by its absolute path) go to the same
+                        thread, so appends to a file stay in order.
+
+        *maxPending*    Maximum number of scans waiting for each writer
+                        thread.  When it is full, submitting waits, which
+                        bounds the memory held by unwritten scans.
+
+        *copy*          Copy the data when it is submitted, so that the
+                        caller may reuse its arrays right away.
+
+        An error from a write is raised by the next call to
+        :meth:`submit`, :meth:`flush` or :meth:`close`.  Use it as
+        a context manager to close it (and so wait for all of the
+        writes) at the end.
+        """
+        if workers < 1 :
+            raise ValueError("workers must be at least 1")
+        self._copy = copy
+        self._errors = []
+        self._errorLock = threading.Lock()
+        self._closed = False
+        self._queues = [queue.Queue(maxsize=maxPending) for
+                        _ in range(workers)]
+        self._threads = [threading.Thread(target=self._write_loop,
+                                          args=(writeQueue,))
+                         for writeQueue in self._queues]
+        for thread in self._threads :
+            thread.daemon = True
+            thread.start()
+
+    def _write_loop(self, writeQueue) :
+        while True :
+            job = writeQueue.get()
+            try :
+                if job is None :
+                    return
+                args, kwargs = job
+                SaveRastRadar(*args, **kwargs)
+            except Exception as err :
+                with self._errorLock :
+                    self._errors.append(err)
+            finally :
+                writeQueue.task_done()
+
+    def _raise_error(self) :
+        with self._errorLock :
+            if not self._errors :
+                return
+            err = self._errors[0]
+            self._errors = []
+        raise err
+
+    def submit(self, filename, rastData, latAxis, lonAxis,
+               scanTime, varName, station, append=False) :
+        """
+        Queue a scan to be written, with the same arguments as
+        :func:`SaveRastRadar`.  Waits only if the queue is full.
+        """
+        if self._closed :
+            raise ValueError("The AsyncRastWriter is closed")
+        self._raise_error()
+
+        if self._copy :
+            rastData = np.array(rastData)
+            latAxis = np.array(latAxis)
+            lonAxis = np.array(lonAxis)
+
+        # By the absolute path, so that every spelling of
+        # a file goes to the same writer thread.
+        writeQueue = self._queues[hash(abspath(filename)) %
+                                  len(self._queues)]
+        writeQueue.put(((filename, rastData, latAxis, lonAxis,
+                         scanTime, varName, station), {'append': append}))
+
+    def flush(self) :
+        """
+        Wait until all of the queued scans are written.
+        """
+        for writeQueue in self._queues :
+            writeQueue.join()
+        self._raise_error()
+
+    def close(self) :
+        """
+        Write all of the queued scans and stop the writer threads.
+        Safe to call more than once.
+        """
+        if not self._closed :
+            self._closed = True
+            for writeQueue in self._queues :
+                writeQueue.put(None)
+            for thread in self._threads :
+                thread.join()
+        self._raise_error()
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, excType, excValue, traceback) :
+        if excType is None :
+            self.close()
+        else :
+            # Don't hide the original exception.
+            try :
+                self.close()
+            except Exception :
+                pass
+
+
+class LazyArray(object) :
+    def __init__(self, nc, varName, dtype=None) :
+        """
+        Array-like proxy for the netcdf variable *varName* in the
+        open :class:`netcdf.netcdf_file` *nc*, which should have been
+        opened with mmap=True.
+
+        Nothing is read until the proxy is indexed, and then only the
+        requested slice is read and copied out of the memory-mapped file.
+        If *dtype* is given, slices are converted to it.
+
+        The proxy owns *nc*, which is closed by :meth:`close`, or when
+        the proxy is garbage-collected.  Indexing a closed proxy raises
+        a ValueError.  The proxy can also be used as a context manager.
+        """
+        self._nc = nc
+        self._data = nc.variables[varName].data
+        self.shape = self._data.shape
+        # netcdf data is big-endian on disk; hand back native arrays.
+        self.dtype = np.dtype(dtype if dtype is not None else
+                              self._data.dtype.newbyteorder('='))
+
+    @property
+    def ndim(self) :
+        return len(self.shape)
+
+    @property
+    def size(self) :
+        return int(np.prod(self.shape))
+
+    def __len__(self) :
+        return self.shape[0]
+
+    def __getitem__(self, index) :
+        if self._data is None :
+            raise ValueError("I/O operation on a closed LazyArray")
+        # Always copy, so that no array refers to the mapped file.
+        return np.array(self._data[index], dtype=self.dtype)
+
+    def __array__(self, dtype=None, copy=None) :
+        vals = self[...]
+        return vals if dtype is None else vals.astype(dtype)
+
+    def close(self) :
+        """
+        Close the underlying file.  Safe to call more than once.
+        """
+        # Drop our reference into the mapped file first, so that the
+        # file can unmap cleanly.
+        self._data = None
+        if self._nc is not None :
+            self._nc.close()
+            self._nc = None
+
+    __del__ = close
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *args) :
+        self.close()
+
+
+def LoadRastRadar(infilename, force_int=False, lazy=False, time_index=None,
+                  latlim=None, lonlim=None) :
     """
     Load a netcdf file produced by :func:`SaveRastRadar` or
     by the NCEP Radar Data Viewer that contains rasterized
     radar data.
 
-    *infilename*    The file name, of course.
+    *infilename*    The file name, of course.  This can also be the
+                    directory of a :class:`BRadar.rasterstore.RasterStore`.
 
     *force_int*     For computers with limited memory,
                     forcing the radar data into integer rather
                     than floats may be very helpful.
 
+    *lazy*          If True, keep the file memory-mapped and return
+                    "vals" as a :class:`LazyArray` that reads only
+                    the slices that are indexed (e.g., vals[0]).
+                    The file is closed when the :class:`LazyArray` is
+                    closed or released.
+
+    *time_index*    Index (or slice, or list of indices) of the scans
+                    to load from a file with several times (see
+                    SaveRastRadar(..., append=True)).  "vals" always keeps
+                    its time dimension.  Default is all of the scans.
+                    Can not be used with *lazy*, where "vals" can be
+                    indexed by time directly.
+
+    *latlim*, *lonlim*  (min, max) limits of a window to load.  Default
+                    is the whole grid.  Only for a RasterStore directory,
+                    where only the needed tiles are decompressed.
+
     Returns a dictionary of info:
         "title"
         "lats"
         "lons"
         "vals"
-        "scan_time"
+        "scan_time"     -- time of the first loaded scan
+        "scan_times"    -- times of all of the loaded scans
         "var_name"  -- might not be very useful...
         "station"
     """
-    nc = netcdf.netcdf_file(infilename, 'r')
+    if lazy and time_index is not None :
+        raise ValueError("time_index can not be used with lazy=True")
+
+    if isinstance(infilename, str) and isdir(infilename) :
+        return _load_rasterstore(infilename, force_int, time_index,
+                                 latlim, lonlim)
+
+    nc = _netcdf_open(infilename, mmap=(True if lazy else None))
 
     # Correction for older rasterized files that used the wrong term.
-    titleStr = (nc.title).replace("Rastified", "Rasterized")
-    try :
-        varName = nc.varName
-    except :
-        varName = 'Reflectivity'
+    titleStr = _nc_attr(nc, 'title', '').replace("Rastified", "Rasterized")
+    varName = _nc_attr(nc, 'varName', 'Reflectivity')
 
     if varName not in nc.variables :
         # Fall back to "value"
         varName = 'value'
 
-    try :
-        station = nc.station
-    except :
+    station = _nc_attr(nc, 'station')
+    if station is None :
         # Try to find station name in the filename
-        fname = basename(infilename)
+        fname = basename(_source_name(infilename))
         nameLoc = fname.find('K')
         if nameLoc != -1 :
             station = fname[nameLoc:nameLoc+4]
@@ -329,21 +1468,287 @@ def LoadRastRadar(infilename, force_int=False) :
                 raise ValueError("Can't find name of station: " + fname)
             station = "NWRT"
 
-    lats = nc.variables['lat'][:]
-    lons = nc.variables['lon'][:]
-    vals = nc.variables[varName][:]
+    times = np.array(nc.variables['time'][:])
+    timeSel = _time_selection(time_index, len(times))
+    timestamp = times[timeSel[0]] if len(timeSel) > 0 else None
 
-    if force_int :
-        vals = vals.astype('i')
+    if lazy :
+        # Copy the axes out of the mapped file so that only
+        # the LazyArray holds on to it.
+        lats = nc.variables['lat'][:].copy()
+        lons = nc.variables['lon'][:].copy()
+        vals = LazyArray(nc, varName, dtype=('i' if force_int else None))
+    else :
+        lats = nc.variables['lat'][:]
+        lons = nc.variables['lon'][:]
+        if time_index is None :
+            vals = nc.variables[varName][:]
+        else :
+            vals = nc.variables[varName][timeSel]
 
-    timestamp = nc.variables['time'][0]
+        if force_int :
+            vals = vals.astype('i')
 
-    nc.close()
+        nc.close()
 
     return {'title': titleStr, 'lats': lats, 'lons': lons,
             'vals': vals, 'scan_time': timestamp,
+            'scan_times': times[timeSel],
+            'var_name': varName, 'station': station}
+
+def _rast_header(filename) :
+    """
+    The grid, times and names of a rasterized radar file (or RasterStore
+    directory), without reading its data.
+    """
+    if isinstance(filename, str) and isdir(filename) :
+        store = RasterStore(filename)
+        return {'lats': store.lats, 'lons': store.lons,
+                'times': store.times, 'var_name': store.var_name,
+                'station': store.station}
+
+    nc = _netcdf_open(filename, mmap=True)
+    varName = _nc_attr(nc, 'varName', 'value')
+    if varName not in nc.variables :
+        varName = 'value'
+    header = {'lats': np.array(nc.variables['lat'][:]),
+              'lons': np.array(nc.variables['lon'][:]),
+              'times': np.array(nc.variables['time'][:]),
+              'var_name': varName,
+              'station': _nc_attr(nc, 'station')}
+    nc.close()
+    return header
+
+def _fill_rast_frames(filename, header, out) :
+    """
+    Read all of the scans of *filename* straight into *out*.
+    """
+    if isinstance(filename, str) and isdir(filename) :
+        store = RasterStore(filename)
+        for index in range(len(store)) :
+            out[index] = store.read(index)[0]
+        return
+
+    nc = _netcdf_open(filename, mmap=True)
+    data = nc.variables[header['var_name']].data
+    out[...] = data
+    # Let go of the mapped data so that the file closes cleanly.
+    del data
+    nc.close()
+
+def LoadRastRadarStack(files, memmap=None, workers=None) :
+    """
+    Load many rasterized radar files (or RasterStore directories)
+    into one (T, Y, X) array, such as for :class:`RadarAnim`.
+
+    The headers are read first to check that all of the grids agree,
+    and to preallocate the array.  Then, each file is read directly
+    into its part of the array.
+
+    *files*         list of strings
+        Files with one or more scans each, in time order.
+
+    *memmap*        string
+        If given, the array is a memory-mapped .npy file of this
+        name (see np.load(..., mmap_mode='r')) rather than in memory.
+
+    *workers*       integer
+        Number of files to read at the same time.  Default is one
+        at a time.
+
+    Returns a dictionary with the same keys as :func:`LoadRastRadar`.
+    """
+    if len(files) == 0 :
+        raise ValueError("No files to load")
+
+    headers = [_rast_header(filename) for filename in files]
+    first = headers[0]
+    for filename, header in zip(files, headers) :
+        if (header['lats'].shape != first['lats'].shape or
+            header['lons'].shape != first['lons'].shape or
+            not np.allclose(header['lats'], first['lats']) or
+            not np.allclose(header['lons'], first['lons'])) :
+            raise ValueError("The grid of %s does not match the grid of %s" %
+                             (filename, files[0]))
+
+    counts = [len(header['times']) for header in headers]
+    starts = np.concatenate(([0], np.cumsum(counts)))
+    shape = (int(starts[-1]), len(first['lats']), len(first['lons']))
+    if memmap is not None :
+        vals = np.lib.format.open_memmap(memmap, mode='w+',
+                                         dtype=np.float32, shape=shape)
+    else :
+        vals = np.empty(shape, dtype=np.float32)
+
+    def fill(fileNum) :
+        _fill_rast_frames(files[fileNum], headers[fileNum],
+                          vals[starts[fileNum]:starts[fileNum + 1]])
+
+    if workers is not None and workers > 1 :
+        pool = ThreadPool(workers)
+        try :
+            pool.map(fill, range(len(files)))
+        finally :
+            pool.terminate()
+            pool.join()
+    else :
+        for fileNum in range(len(files)) :
+            fill(fileNum)
+
+    if memmap is not None :
+        vals.flush()
+
+    times = np.concatenate([header['times'] for header in headers])
+    station = first['station']
+    varName = first['var_name']
+    titleStr = 'Rasterized %s %s %s' % (station, varName,
+                datetime.datetime.utcfromtimestamp(times[0]).strftime('%H:%M:%S UTC %m/%d/%Y'))
+    return {'title': titleStr, 'lats': first['lats'], 'lons': first['lons'],
+            'vals': vals, 'scan_time': times[0], 'scan_times': times,
             'var_name': varName, 'station': station}
 
+def _time_selection(time_index, count) :
+    """
+    Array of the time indices selected by *time_index* (see
+    :func:`LoadRastRadar`) out of *count* times.
+    """
+    allTimes = np.arange(count)
+    if time_index is None :
+        return allTimes
+    if np.ndim(time_index) == 0 and not isinstance(time_index, slice) :
+        if not -count <= time_index < count :
+            raise IndexError("time_index %d is out of range" % time_index)
+        return allTimes[[time_index]]
+    return allTimes[time_index]
+
+def _load_rasterstore(dirname, force_int, time_index, latlim, lonlim) :
+    """
+    The :func:`LoadRastRadar` reader for a RasterStore directory.
+    """
+    store = RasterStore(dirname)
+    timeSel = _time_selection(time_index, len(store))
+    if len(timeSel) == 0 :
+        raise IndexError("No scans selected from %s" % dirname)
+
+    # Same (time, lat, lon) shape as the "value" variable
+    # of SaveRastRadar's files
+    vals = None
+    for timeNum, index in enumerate(timeSel) :
+        frame, lats, lons = store.read(index, latlim, lonlim)
+        if vals is None :
+            vals = np.empty((len(timeSel),) + frame.shape, dtype=frame.dtype)
+        vals[timeNum] = frame
+    timestamp = store.times[timeSel[0]]
+    if force_int :
+        vals = vals.astype('i')
+
+    titleStr = 'Rasterized %s %s %s' % (store.station, store.var_name,
+                datetime.datetime.utcfromtimestamp(timestamp).strftime('%H:%M:%S UTC %m/%d/%Y'))
+    return {'title': titleStr, 'lats': lats, 'lons': lons,
+            'vals': vals, 'scan_time': timestamp,
+            'scan_times': store.times[timeSel],
+            'var_name': store.var_name, 'station': store.station}
+
+def LoadRadarHeader(filename) :
+    """
+    Read just the header of a radar file supported by the loaders in
+    this module, without reading its data.  Only the netcdf header
+    (and the time and lat/lon variables, if any) and the 24-byte
+    Archive II volume header are read.
+
+    *filename* can also be a seekable file object, which is left at the
+    same position, and it can be gzip or bzip2 compressed.  For compressed
+    files, only the start of the file is decompressed, except that the
+    times of a rasterized file are stored after its data, which still
+    has to be decompressed (but is not kept) to get to them.
+
+    Returns a dictionary with the following keys:
+        'data_type'     The file format, such as the DataType of WDSSII files,
+                        'LIPN', 'Rasterized', 'Level2' or 'Archive2'
+        'scan_time'     Time of the (first) scan, in seconds since 1970-1-1
+        'last_time'     Time of the last scan (for files with many scans)
+        'time_count'    Number of scans in the file
+        'station'       Station name, or None if it is not in the header
+        'var_name'      Name of the variable, or None for files with
+                        several moments
+        'lats'          Lat axis of rasterized data (None otherwise)
+        'lons'          Lon axis of rasterized data (None otherwise)
+    """
+    header = {'data_type': None, 'scan_time': None, 'last_time': None,
+              'time_count': 1, 'station': None, 'var_name': None,
+              'lats': None, 'lons': None}
+
+    if isinstance(filename, str) and isdir(filename) :
+        store = RasterStore(filename)
+        times = store.times
+        header.update(data_type='Rasterized', scan_time=times.min(),
+                      last_time=times.max(), time_count=len(times),
+                      station=store.station, var_name=store.var_name,
+                      lats=store.lats, lons=store.lons)
+        return header
+
+    reader = _PartReader(filename)
+    try :
+        magic = reader.head(_AR2_VOLUME_HEADER.size)
+        if magic[:4] == b'AR2V' :
+            volHeader = _AR2_VOLUME_HEADER.unpack(magic)
+            # Julian date (day 1 is 1970-01-01) and milliseconds
+            # past midnight
+            scanTime = (volHeader[2] - 1) * 86400 + volHeader[3] / 1000.0
+            header.update(data_type='Archive2', scan_time=scanTime,
+                          last_time=scanTime,
+                          station=(volHeader[4].decode('ascii').strip() or
+                                   None))
+            return header
+
+        try :
+            nc = _NetcdfHeader(reader)
+        except (ValueError, KeyError) :
+            raise ValueError("Unknown radar file format: %s" %
+                             _source_name(filename))
+
+        if 'TypeName' in nc._attributes :
+            scanTime = _nc_attr(nc, 'Time')
+            header.update(data_type=_nc_attr(nc, 'DataType'),
+                          scan_time=scanTime, last_time=scanTime,
+                          station=_nc_attr(nc, 'radarName-value'),
+                          var_name=_nc_attr(nc, 'TypeName'))
+        elif 'R0' in nc.variables :
+            scanTime = _nc_attr(nc, 'ScanTimeUTC')
+            header.update(data_type='LIPN', scan_time=scanTime,
+                          last_time=scanTime)
+        elif 'time_coverage_start' in nc._attributes :
+            times = [calendar.timegm(datetime.datetime.strptime(
+                        _nc_attr(nc, name),
+                        "%Y-%m-%dT%H:%M:%SZ").timetuple()) for name in
+                     ('time_coverage_start', 'time_coverage_end') if
+                     name in nc._attributes]
+            # The station name is not in the file yet (see LoadLevel2).
+            header.update(data_type='Level2', scan_time=times[0],
+                          last_time=times[-1],
+                          station=basename(_source_name(filename))[0:4])
+        elif 'lat' in nc.variables and 'lon' in nc.variables :
+            # In file order, as compressed files are only read forward.
+            names = sorted(('lat', 'lon', 'time'), key=lambda name :
+                           (nc.variables[name].isrec,
+                            nc.variables[name].begin))
+            values = dict((name, nc.read_var(reader, name)) for
+                          name in names)
+            lats, lons, times = values['lat'], values['lon'], values['time']
+            header.update(data_type=_nc_attr(nc, 'DataType', 'Rasterized'),
+                          scan_time=times.min(), last_time=times.max(),
+                          time_count=len(times),
+                          station=_nc_attr(nc, 'station'),
+                          var_name=_nc_attr(nc, 'varName', 'value'),
+                          lats=lats, lons=lons)
+        else :
+            raise ValueError("Unknown radar file format: %s" %
+                             _source_name(filename))
+    finally :
+        reader.close()
+
+    return header
+
 class RadarCache(object) :
     def __init__(self, files, cachewidth=3, load_func=None, cyclable=False) :
         """
@@ -485,3 +1890,298 @@ class RadarCache(object) :
     def __len__(self) :
         return len(self._filenames)
 
+
+def LoadMany(files, load_func=None, workers=4, processes=False,
+             window=None) :
+    """
+    Load many radar files concurrently, yielding the results
+    in the same order as *files*.
+
+    *files*         list of strings
+        Filenames of the radar data.
+
+    *load_func*     method
+        Function that takes a filename string and returns a radar
+        data dictionary, such as :func:`LoadRastRadar`,
+        :func:`LoadLevel2`, :func:`LoadPAR_lipn` or
+        :func:`LoadPAR_wdssii`.  If None, then default to
+        :func:`LoadRastRadar`.
+
+    *workers*       integer
+        Number of files to load at the same time.
+
+    *processes*     bool
+        Load in a pool of processes rather than threads.  This helps
+        when decoding is CPU-bound, but *load_func* and its results
+        must be picklable (e.g., no lazy=True).  Default: False.
+
+    *window*        integer
+        Maximum number of loaded or loading files that are held
+        ahead of the consumer.  Default: twice *workers*.
+
+    This is a generator, so files are only loaded as the results
+    are consumed, and at most *window* results are held in memory.
+    An exception from *load_func* is raised when its result
+    is reached.
+    """
+    if workers < 1 :
+        raise ValueError("workers must be at least 1")
+    if load_func is None :
+        load_func = LoadRastRadar
+    if window is None :
+        window = 2 * workers
+    window = max(window, 1)
+
+    pool = (Pool if processes else ThreadPool)(workers)
+    pending = deque()
+    try :
+        for filename in files :
+            pending.append(pool.apply_async(load_func, (filename,)))
+            if len(pending) >= window :
+                yield pending.popleft().get()
+
+        while pending :
+            yield pending.popleft().get()
+    finally :
+        # Also reached when the consumer stops early.
+        pool.terminate()
+        pool.join()
+
+
+# The loader registry.  _formats holds the (name, sniff) pairs in the
+# order that they are tried, and _loaders the load function of each name.
+_formats = []
+_loaders = {}
+# filename -> (mtime, size, format name) of the files sniffed so far
+_sniffCache = {}
+
+def RegisterLoader(name, load_func, sniff=None) :
+    """
+    Add the loader *load_func* for the file format *name* to the
+    registry used by :func:`SniffFormat` and :func:`LoadRadar`.
+
+    *sniff*         Function that returns True if a file is of this format.
+                    It is given the filename, the first 24 bytes of the
+                    file (decompressed, for compressed files; None for
+                    directories) and the header of the netcdf file (None
+                    if it is not a netcdf file).  The header has the
+                    `dimensions`, `_attributes` and `variables` of a
+                    :class:`netcdf.netcdf_file`, but no data.
+                    Formats registered later are tried first.
+
+    Registering an existing *name* again replaces it.
+    """
+    _loaders[name] = load_func
+    _formats[:] = [(fmtName, fmtSniff) for fmtName, fmtSniff in _formats if
+                   fmtName != name]
+    if sniff is not None :
+        _formats.insert(0, (name, sniff))
+    _sniffCache.clear()
+
+def SniffFormat(filename) :
+    """
+    Name of the registered format of *filename* (see
+    :func:`RegisterLoader`), from cheap reads of its header.
+    Only as much of the start of the file as the header takes up
+    is read (and decompressed, for compressed files).
+
+    The result is cached for each file until it is modified, so a file
+    is only opened once to identify it.  Raises a ValueError if no
+    format matches.
+
+    *filename* can also be a seekable file object, which is left at
+    the same position for the loader.  These are not cached.
+    """
+    key = None
+    if isinstance(filename, str) :
+        info = stat(filename)
+        key = abspath(filename)
+        cached = _sniffCache.get(key)
+        if (cached is not None and
+            cached[:2] == (info.st_mtime, info.st_size)) :
+            return cached[2]
+
+    magic = None
+    nc = None
+    if not (isinstance(filename, str) and isdir(filename)) :
+        reader = _PartReader(filename)
+        try :
+            magic = reader.head(_AR2_VOLUME_HEADER.size)
+            # Both netcdf-3 formats (32 and 64-bit offsets)
+            if magic[:4] in (b'CDF\x01', b'CDF\x02') :
+                try :
+                    nc = _NetcdfHeader(reader)
+                except (ValueError, KeyError) :
+                    raise ValueError("Unknown radar file format: %s" %
+                                     _source_name(filename))
+        finally :
+            reader.close()
+
+    for name, sniff in _formats :
+        if sniff(filename, magic, nc) :
+            break
+    else :
+        raise ValueError("Unknown radar file format: %s" %
+                         _source_name(filename))
+
+    if key is not None :
+        _sniffCache[key] = (info.st_mtime, info.st_size, name)
+    return name
+
+def LoadRadar(filename, **kwargs) :
+    """
+    Load *filename* with the registered loader for its format
+    (see :func:`SniffFormat`).  The keyword arguments are passed
+    on to the loader.
+    """
+    if not isinstance(filename, str) :
+        seekable = getattr(filename, 'seekable', None)
+        if seekable is None or not seekable() :
+            # Sniffing has to leave the whole file for the loader.
+            filename = _spool(filename)
+    return _loaders[SniffFormat(filename)](filename, **kwargs)
+
+def _sniff_rast(filename, magic, nc) :
+    if nc is None :
+        return (isinstance(filename, str) and isdir(filename) and
+                exists(join(filename, _HEADER_NAME)))
+    return all(name in nc.variables for name in ('lat', 'lon', 'time'))
+
+def _sniff_level2(filename, magic, nc) :
+    return (nc is not None and
+            (str(_nc_attr(nc, 'cdm_data_type', '')).upper() == 'RADIAL' or
+             'time_coverage_start' in nc._attributes))
+
+def _sniff_lipn(filename, magic, nc) :
+    return nc is not None and 'R0' in nc.variables
+
+def _sniff_wdssii(filename, magic, nc) :
+    return (nc is not None and 'TypeName' in nc._attributes and
+            'DataType' in nc._attributes)
+
+def _sniff_archive2(filename, magic, nc) :
+    return magic is not None and magic[:4] == b'AR2V'
+
+RegisterLoader('rast', LoadRastRadar, _sniff_rast)
+RegisterLoader('level2', LoadLevel2, _sniff_level2)
+RegisterLoader('lipn', LoadPAR_lipn, _sniff_lipn)
+RegisterLoader('wdssii', LoadPAR_wdssii, _sniff_wdssii)
+RegisterLoader('archive2', LoadArchive2, _sniff_archive2)
+
+
+class TarSource(object) :
+    def __init__(self, tarname, pattern='*', load_func=None) :
+        """
+        Radar files inside of the tar archive *tarname* (which can be
+        gzip or bzip2 compressed), read without extracting them to disk.
+
+        *pattern*       Only members whose base names match this glob
+                        pattern are used.
+
+        *load_func*     Function that takes a file object and returns a
+                        radar data dictionary.  If None, then default to
+                        :func:`LoadRadar`, which picks the loader for
+                        each member by its format.
+
+        This acts as a list of the member names, and :meth:`load`
+        loads a member by name, so it can be given to :class:`RadarCache`
+        (or :func:`LoadMany`) as the file list::
+
+            src = TarSource('KTLX20110524.tar')
+            rd = RadarCache(src, load_func=src.load)
+
+        To just go through all of the members once, in the order that
+        they are stored, use :meth:`stream`, which reads the archive
+        sequentially, without building an index first.
+        """
+        self.tarname = tarname
+        self.pattern = pattern
+        self._load_func = load_func if load_func is not None else LoadRadar
+        self._tar = None
+        self._members = None
+        self._names = None
+        self._lock = threading.Lock()
+
+    def _wanted(self, member) :
+        return (member.isfile() and
+                fnmatch.fnmatch(basename(member.name), self.pattern))
+
+    def _index(self) :
+        # Under the lock, so that concurrent first calls
+        # open and index the archive only once.
+        with self._lock :
+            if self._tar is None :
+                self._tar = tarfile.open(self.tarname, 'r:*')
+                members = [member for member in self._tar.getmembers() if
+                           self._wanted(member)]
+                self._members = dict((member.name, member) for
+                                     member in members)
+                self._names = [member.name for member in members]
+            return self._names
+
+    @property
+    def names(self) :
+        """
+        Names of the radar file members, in the order that they are stored.
+        """
+        return list(self._index())
+
+    def __len__(self) :
+        return len(self._index())
+
+    def __getitem__(self, index) :
+        return self._index()[index]
+
+    def __iter__(self) :
+        return iter(self._index())
+
+    def _read_member(self, tar, member) :
+        """
+        The contents of *member* as a file object named after it.
+        This is the only copy of the member that is made: the loader
+        identifies the format from the start of it and then reads it.
+        """
+        return _spool(tar.extractfile(member), member.name)
+
+    def open(self, name) :
+        """
+        The member *name* as a seekable file object.
+        """
+        self._index()
+        # The archive has only one read position.
+        with self._lock :
+            return self._read_member(self._tar, self._members[name])
+
+    def load(self, name) :
+        """
+        Load the member *name* with the loader.
+        """
+        return self._load_func(self.open(name))
+
+    def stream(self) :
+        """
+        Load each radar file member in the order that it is stored,
+        reading the archive just once, from start to end.
+
+        Yields the member name and its radar data.
+        """
+        with tarfile.open(self.tarname, 'r|*') as tar :
+            for member in tar :
+                if self._wanted(member) :
+                    yield member.name, self._load_func(
+                                            self._read_member(tar, member))
+
+    def close(self) :
+        """
+        Close the archive.  It is reopened as needed.
+        """
+        with self._lock :
+            if self._tar is not None :
+                self._tar.close()
+                self._tar = None
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *args) :
+        self.close()
@@ -1,6 +1,11 @@
 import os.path			# for os.path.dirname(), os.path.abspath(), os.path.sep
+import hashlib
+import tempfile
+from collections import OrderedDict
 import numpy as np
 
+from BRadar.shpreader import ReadShapefile, ReadDBF
+
 
 #################################
 #    Basemap-related portion    #
@@ -24,32 +29,449 @@ def PlotMapLayers(bmap, layerOptions=None, axis=None, **kwargs) :
     *axis*          Matplotlib axes object
     *kwargs*        Any keywords you wish to use to override or augment
                     the keywords used in *layerOptions*.
+
+    The 'counties' and 'roads' layers are read from the bundled shapefiles
+    and projected only once per map projection.  Subsequent calls for
+    the same projection (e.g., one call per axes in a multi-panel
+    display) re-use the cached geometry.  The projected geometry is also
+    saved under `layerCacheDir` so that other processes can load it
+    without touching the shapefiles.
+
+    Only the polylines that fall within the axes' view are drawn, and
+    they are drawn at a level of detail appropriate for the size of a
+    display pixel (see `lodTolerances`).  Both are updated whenever the
+    view limits change.
+
+    Like :meth:`Basemap.readshapefile`, the projected shapes and their
+    attributes are also set on *bmap*, as `bmap.counties` and
+    `bmap.counties_info` for 'counties' and as `bmap.road` and
+    `bmap.road_info` for 'roads'.  Each shape is an N x 2 array
+    of its (x, y) vertices.
+
+    Returns an ordered dictionary of the layer names and their artists.
+    Each layer is a single :class:`LineCollection`.
     """
     if layerOptions is None :
         layerOptions = mapLayers
 
-    # TODO: Learn to use pkg_resources
-    module_path = os.path.dirname(os.path.abspath(__file__))
-
+    artists = OrderedDict()
     for layer in layerOptions :
         style = layer[1].copy()
         style.update(kwargs)
         if layer[0] == 'states' :
-            bmap.drawstates(ax=axis, **style)
+            artists[layer[0]] = bmap.drawstates(ax=axis, **style)
         elif layer[0] == 'counties' :
-            bmap.readshapefile(os.path.join(module_path,
-                                            'shapefiles', 'countyp020'),
-                               name='counties', ax=axis, **style)
+            mapLayer = _load_layer(bmap, 'counties')
+            _set_layer_attrs(bmap, 'counties', mapLayer)
+            artists[layer[0]] = _draw_layer(bmap, mapLayer, axis, **style)
         elif layer[0] == 'rivers' :
-            bmap.drawrivers(ax=axis, **style)
+            artists[layer[0]] = bmap.drawrivers(ax=axis, **style)
         elif layer[0] == 'roads' :
-            bmap.readshapefile(os.path.join(module_path,
-                                            'shapefiles', 'road_l'),
-                               name='road', ax=axis, **style)
+            mapLayer = _load_layer(bmap, 'roads')
+            _set_layer_attrs(bmap, 'roads', mapLayer)
+            artists[layer[0]] = _draw_layer(bmap, mapLayer, axis, **style)
         elif layer[0] == 'countries':
-            bmap.drawcountries(ax=axis, **style)
+            artists[layer[0]] = bmap.drawcountries(ax=axis, **style)
         else :
             raise ValueError('Unknown map_layer type: ' + layer[0])
+
+    return artists
+
+
+# Douglas-Peucker tolerances (in map projection units, typically meters)
+# of the simplified versions of the shapefile layers.  The first level
+# should always be 0.0 (the full resolution geometry).
+lodTolerances = (0.0, 100.0, 400.0, 1600.0, 6400.0)
+
+# Projected geometry of the bundled shapefiles, keyed by the shapefile
+# path and the map projection.  Each entry is a _MapLayer.
+_layerCache = {}
+
+# Bump this whenever the arrays stored in the on-disk cache change.
+_layerCacheVersion = 3
+
+# The shapefiles behind the layers that PlotMapLayers draws itself.
+_layerShapefiles = {'counties': 'countyp020', 'roads': 'road_l'}
+
+# The Basemap attributes that Basemap.readshapefile used to set for them.
+_layerAttrNames = {'counties': 'counties', 'roads': 'road'}
+
+# Directory for the on-disk copy of _layerCache.  Set to None to disable.
+layerCacheDir = os.environ.get('BRADAR_CACHE_DIR',
+                               os.path.join(os.path.expanduser('~'),
+                                            '.bradar', 'maplayers'))
+
+class _MapLayer(object) :
+    def __init__(self, levels, index, records) :
+        """
+        Projected polylines of a map layer at multiple levels of detail.
+
+        *levels*        list of (verts, offsets) tuples, one per tolerance
+                        in `lodTolerances`.  *verts* is an N x 2 array
+                        of the concatenated vertices of all of the polylines
+                        and *offsets* is the index into *verts* of the start
+                        of each polyline, plus a final entry of N.
+
+        *index*         :class:`BBoxIndex` of the polylines.
+
+        *records*       The shapefile record number of each polyline.
+        """
+        self.levels = levels
+        self.index = index
+        self.records = records
+        self._info = None
+
+    @classmethod
+    def from_polylines(cls, verts, offsets, records) :
+        """
+        Build the layer from the full resolution polylines, computing
+        the simplified levels and the bounding boxes.
+        """
+        levels = [(verts, offsets)]
+        for tolerance in lodTolerances[1:] :
+            levels.append(SimplifyPolylines(verts, offsets, tolerance))
+
+        return cls(levels, BBoxIndex(PolylineBBoxes(verts, offsets)),
+                   records)
+
+    def select(self, xlim, ylim) :
+        """
+        Indices of the polylines whose bounding boxes intersect the
+        view given by *xlim* and *ylim*.
+        """
+        return self.index.query((min(xlim), min(ylim),
+                                 max(xlim), max(ylim)))
+
+    def segments(self, xlim, ylim, pixelSize=0.0) :
+        """
+        List of vertex arrays of the polylines within the view given
+        by *xlim* and *ylim*, from the coarsest level of detail whose
+        tolerance is within half of *pixelSize*.
+        """
+        level = max(index for index, tolerance in enumerate(lodTolerances)
+                    if tolerance <= 0.5 * pixelSize)
+        verts, offsets = self.levels[level]
+        # Views into *verts*, no copies.
+        return [verts[offsets[index]:offsets[index + 1]] for
+                index in self.select(xlim, ylim)]
+
+    def shapes(self) :
+        """
+        List of the full resolution polylines, as N x 2 vertex arrays.
+        """
+        verts, offsets = self.levels[0]
+        return [verts[offsets[index]:offsets[index + 1]] for
+                index in range(len(offsets) - 1)]
+
+    def info(self, shapefile) :
+        """
+        List of the attribute dictionaries of the polylines, read from
+        the .dbf of *shapefile*, with the 'RINGNUM' and 'SHAPENUM' keys
+        of :meth:`Basemap.readshapefile`.  Read only once.
+        """
+        if self._info is None :
+            table = ReadDBF(shapefile)
+            fields = table['fields']
+            # Keyed by record number, as deleted records are left out.
+            rows = dict(zip(table['records'].tolist(),
+                            zip(*[table[name].tolist() for name in fields])))
+            # The parts of a record are consecutive, so this numbers
+            # each polyline within its record.
+            records = np.asarray(self.records)
+            ringNums = (np.arange(len(records)) -
+                        np.searchsorted(records, records))
+            self._info = []
+            for record, ringNum in zip(records.tolist(), ringNums.tolist()) :
+                shapeInfo = dict(zip(fields, rows.get(record, ())))
+                shapeInfo['RINGNUM'] = ringNum + 1
+                shapeInfo['SHAPENUM'] = record + 1
+                self._info.append(shapeInfo)
+        return self._info
+
+    def arrays(self) :
+        """
+        Flat dictionary of all of the arrays for the on-disk cache.
+        """
+        arrays = dict(('index_' + name, arr) for name, arr in
+                      self.index.arrays().items())
+        arrays['records'] = self.records
+        for index, (verts, offsets) in enumerate(self.levels) :
+            arrays['verts%d' % index] = verts
+            arrays['offsets%d' % index] = offsets
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) :
+        """
+        Inverse of :meth:`arrays`.
+        """
+        levels = [(arrays['verts%d' % index], arrays['offsets%d' % index])
+                  for index in range(len(lodTolerances))]
+        index = BBoxIndex.from_arrays(dict((name, arrays['index_' + name])
+                                           for name in BBoxIndex.arrayNames))
+        return cls(levels, index, arrays['records'])
+
+def SimplifyPolylines(verts, offsets, tolerance) :
+    """
+    Simplify polylines using the Douglas-Peucker algorithm.
+
+    *verts*         N x 2 array of the concatenated polyline vertices.
+    *offsets*       Index into *verts* of the start of each polyline,
+                    with a final entry of N.
+    *tolerance*     Maximum distance (in the units of *verts*) of a
+                    removed vertex from the simplified polyline.
+
+    All polylines are processed together, one level of the
+    Douglas-Peucker recursion at a time, rather than looping over
+    each polyline in Python.
+
+    Returns the simplified (verts, offsets).
+    """
+    verts = np.asarray(verts)
+    offsets = np.asarray(offsets)
+    keep = np.zeros(len(verts), dtype=bool)
+
+    starts = offsets[:-1]
+    ends = offsets[1:] - 1
+    nonEmpty = ends >= starts
+    keep[starts[nonEmpty]] = True
+    keep[ends[nonEmpty]] = True
+
+    # The spans (inclusive) that still have interior vertices to check.
+    hasInterior = (ends - starts) > 1
+    spanStart = starts[hasInterior]
+    spanEnd = ends[hasInterior]
+
+    while len(spanStart) > 0 :
+        counts = spanEnd - spanStart - 1
+        spanIds = np.repeat(np.arange(len(spanStart)), counts)
+        firsts = np.cumsum(counts) - counts
+        pointIds = (spanStart[spanIds] + 1 +
+                    np.arange(len(spanIds)) - firsts[spanIds])
+
+        # Distance of each interior vertex from the span's chord.
+        a = verts[spanStart[spanIds]]
+        chord = verts[spanEnd[spanIds]] - a
+        rel = verts[pointIds] - a
+        chordLen = np.hypot(chord[:, 0], chord[:, 1])
+        cross = np.abs(chord[:, 0] * rel[:, 1] - chord[:, 1] * rel[:, 0])
+        # Closed rings have a zero-length chord.
+        dists = np.where(chordLen > 0.0,
+                         cross / np.where(chordLen > 0.0, chordLen, 1.0),
+                         np.hypot(rel[:, 0], rel[:, 1]))
+
+        maxDists = np.maximum.reduceat(dists, firsts)
+        farthest = np.flatnonzero(dists == maxDists[spanIds])
+        # Take the first of any ties for each span.
+        _, firstOfSpan = np.unique(spanIds[farthest], return_index=True)
+        splits = pointIds[farthest[firstOfSpan]]
+
+        refine = maxDists > tolerance
+        splits = splits[refine]
+        keep[splits] = True
+
+        spanStart, spanEnd = (np.concatenate((spanStart[refine], splits)),
+                              np.concatenate((splits, spanEnd[refine])))
+        hasInterior = (spanEnd - spanStart) > 1
+        spanStart = spanStart[hasInterior]
+        spanEnd = spanEnd[hasInterior]
+
+    keptBefore = np.concatenate(([0], np.cumsum(keep)))
+    return verts[keep], keptBefore[offsets]
+
+def PolylineBBoxes(verts, offsets) :
+    """
+    Bounding boxes of polylines given as concatenated *verts* (N x 2)
+    and *offsets* (start of each polyline, plus a final entry of N).
+
+    Returns a P x 4 array of (xmin, ymin, xmax, ymax) for each of the
+    P polylines.  Empty polylines get NaNs, which never intersect anything.
+    """
+    offsets = np.asarray(offsets)
+    bboxes = np.empty((len(offsets) - 1, 4))
+    bboxes.fill(np.nan)
+    nonEmpty = offsets[1:] > offsets[:-1]
+    if nonEmpty.any() :
+        # Empty polylines contribute no vertices, so the reduction from
+        # one non-empty start to the next covers just that polyline.
+        starts = offsets[:-1][nonEmpty]
+        bboxes[nonEmpty, :2] = np.minimum.reduceat(verts, starts)
+        bboxes[nonEmpty, 2:] = np.maximum.reduceat(verts, starts)
+    return bboxes
+
+def LayerFeatures(bmap, layerName, bbox) :
+    """
+    Find the features of a bundled map layer within a region.
+
+    *bmap*          Basemap instance
+    *layerName*     'counties' or 'roads'
+    *bbox*          (xmin, ymin, xmax, ymax) in the map coordinates of *bmap*
+
+    Returns the sorted indices of the polylines of the layer whose
+    bounding boxes intersect *bbox*.  The indices are of the parts
+    returned by :func:`BRadar.shpreader.ReadShapefile` (the same shapes
+    that :meth:`Basemap.readshapefile` would produce).
+    The layer (and its spatial index) is loaded from the same caches
+    that :func:`PlotMapLayers` uses.
+    """
+    if layerName not in _layerShapefiles :
+        raise ValueError('Unknown map_layer type: ' + layerName)
+
+    return _load_layer(bmap, layerName).index.query(bbox)
+
+def _shapefile_path(shpName) :
+    # TODO: Learn to use pkg_resources
+    module_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(module_path, 'shapefiles', shpName)
+
+def _proj_key(bmap) :
+    """
+    Hashable description of the projection and domain of Basemap *bmap*.
+    Two Basemaps with the same key project lon/lats to the same x/y.
+    """
+    projparams = getattr(bmap, 'projparams', {})
+    return ((bmap.projection,) +
+            tuple(sorted((k, str(v)) for k, v in projparams.items())) +
+            tuple(getattr(bmap, attr, None) for attr in
+                  ('llcrnrlon', 'llcrnrlat', 'urcrnrlon', 'urcrnrlat')))
+
+def _load_layer(bmap, name) :
+    """
+    Return the projected :class:`_MapLayer` for the bundled shapefile
+    of layer *name*, reading and projecting it only if it isn't cached yet.
+    """
+    shpName = _layerShapefiles[name]
+    shapefile = _shapefile_path(shpName)
+    key = (shapefile, _proj_key(bmap))
+    if key in _layerCache :
+        return _layerCache[key]
+
+    diskName = _layer_cache_name(shpName, key)
+    arrays = _read_layer_cache(diskName)
+    if arrays is not None :
+        layer = _MapLayer.from_arrays(arrays)
+    else :
+        shp = ReadShapefile(shapefile)
+        # Project all of the vertices in one shot.
+        xs, ys = bmap(shp['verts'][:, 0], shp['verts'][:, 1])
+        verts = np.column_stack((xs, ys))
+        layer = _MapLayer.from_polylines(verts, shp['offsets'],
+                                         shp['records'])
+        _write_layer_cache(diskName, layer.arrays())
+
+    _layerCache[key] = layer
+    return layer
+
+def _set_layer_attrs(bmap, name, layer) :
+    """
+    Set the shapes of *layer* and their attributes on *bmap*, the same
+    way that :meth:`Basemap.readshapefile` did, for existing callers.
+    """
+    attrName = _layerAttrNames[name]
+    setattr(bmap, attrName, layer.shapes())
+    setattr(bmap, attrName + '_info',
+            layer.info(_shapefile_path(_layerShapefiles[name])))
+
+def _layer_cache_name(shpName, key) :
+    """
+    Base filename in `layerCacheDir` for the layer identified by *key*.
+    The name hashes the projection, the levels of detail and the state
+    of the shapefile, so a stale cache is never picked up.
+    """
+    if layerCacheDir is None :
+        return None
+
+    try :
+        shpStat = os.stat(key[0] + '.shp')
+        stamp = (shpStat.st_size, int(shpStat.st_mtime))
+    except OSError :
+        stamp = None
+
+    digest = hashlib.md5(repr((key, stamp, lodTolerances,
+                               _layerCacheVersion)).encode('utf-8'))
+    return os.path.join(layerCacheDir,
+                        '%s_%s' % (shpName, digest.hexdigest()))
+
+def _cache_array_names() :
+    """
+    Names of the cached arrays, in the order that they are written.
+    The last one marks a complete entry.
+    """
+    return (['index_' + name for name in BBoxIndex.arrayNames] +
+            ['records'] +
+            ['%s%d' % (name, index) for index in
+             reversed(range(len(lodTolerances))) for
+             name in ('verts', 'offsets')])
+
+def _read_layer_cache(diskName) :
+    """
+    Memory-map the cached arrays for *diskName*.
+    Returns None if there is no usable cache.
+    """
+    if diskName is None :
+        return None
+
+    arrays = {}
+    # Check the completion marker first.
+    for arrName in reversed(_cache_array_names()) :
+        try :
+            arrays[arrName] = np.load('%s_%s.npy' % (diskName, arrName),
+                                      mmap_mode='r')
+        except (IOError, OSError, ValueError) :
+            return None
+
+    return arrays
+
+def _write_layer_cache(diskName, arrays) :
+    """
+    Save the dictionary of *arrays* to the on-disk cache.  Each array
+    is written to a temporary file first and then renamed into place,
+    so concurrent processes never see a partially written cache.
+    Failure to write the cache is not an error.
+    """
+    if diskName is None :
+        return
+
+    try :
+        cacheDir = os.path.dirname(diskName)
+        if not os.path.isdir(cacheDir) :
+            os.makedirs(cacheDir)
+
+        for arrName in _cache_array_names() :
+            fd, tmpName = tempfile.mkstemp(dir=cacheDir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f :
+                np.save(f, np.ascontiguousarray(arrays[arrName]))
+            os.rename(tmpName, '%s_%s.npy' % (diskName, arrName))
+    except (IOError, OSError) :
+        pass
+
+def _draw_layer(bmap, layer, axis=None, **style) :
+    """
+    Add the polylines of :class:`_MapLayer` *layer* that are within
+    view to the axes as a single :class:`LineCollection`.  The
+    collection is refreshed whenever the view limits change.
+    """
+    from matplotlib.collections import LineCollection
+    import matplotlib.pyplot as plt
+
+    if axis is None :
+        axis = bmap.ax if bmap.ax is not None else plt.gca()
+
+    bmap.set_axes_limits(ax=axis)
+
+    lines = LineCollection([], **style)
+
+    def _update_segments(ax) :
+        xlim = ax.get_xlim()
+        ylim = ax.get_ylim()
+        pixelSize = abs(xlim[1] - xlim[0]) / max(ax.bbox.width, 1.0)
+        lines.set_segments(layer.segments(xlim, ylim, pixelSize))
+
+    _update_segments(axis)
+    axis.add_collection(lines, autolim=False)
+    axis.callbacks.connect('xlim_changed', _update_segments)
+    axis.callbacks.connect('ylim_changed', _update_segments)
+    return lines
 #------------------------------#
 ################################
 
@@ -346,6 +768,137 @@ def find_limits(index1, index2) :
     lowerLims = np.where(diff > 0.0, np.ceil(Z), -np.inf)
     upperLims = np.where(diff < 0.0, np.floor(Z), np.inf)
     return (lowerLims, upperLims)
+
+
+class BBoxIndex(object) :
+    # Names of the arrays returned by arrays()
+    arrayNames = ('bboxes', 'grid', 'cellStarts', 'featureIds')
+
+    def __init__(self, bboxes, cellsPerSide=None) :
+        """
+        A uniform grid spatial index of bounding boxes.
+
+        *bboxes*        P x 4 array of (xmin, ymin, xmax, ymax) of each
+                        feature.  Features with NaN bounding boxes are
+                        never found.
+
+        *cellsPerSide*  Number of grid cells along each side of the grid.
+                        Default is sqrt(P), giving on the order of one
+                        feature per cell.
+
+        Each feature is registered with every grid cell that its bounding
+        box overlaps, and the cells are stored as a sorted table of feature
+        ids with the start of each cell in that table.  Query with
+        :meth:`query`.  The index can be saved and restored with
+        :meth:`arrays` and :meth:`from_arrays`.
+        """
+        if bboxes is None :
+            # Used by from_arrays()
+            return
+
+        self.bboxes = np.asarray(bboxes, dtype=float).reshape((-1, 4))
+        good = np.flatnonzero(np.all(np.isfinite(self.bboxes), axis=1))
+        if cellsPerSide is None :
+            cellsPerSide = max(int(np.sqrt(len(good))), 1)
+
+        if len(good) > 0 :
+            extent = (self.bboxes[good, 0].min(), self.bboxes[good, 1].min(),
+                      self.bboxes[good, 2].max(), self.bboxes[good, 3].max())
+        else :
+            extent = (0.0, 0.0, 1.0, 1.0)
+
+        # (xmin, ymin, cell width, cell height, cells in x, cells in y)
+        self.grid = np.array([extent[0], extent[1],
+                              max(extent[2] - extent[0], 1e-12) / cellsPerSide,
+                              max(extent[3] - extent[1], 1e-12) / cellsPerSide,
+                              cellsPerSide, cellsPerSide])
+
+        ix0, iy0 = self._cell_coords(self.bboxes[good, 0],
+                                     self.bboxes[good, 1])
+        ix1, iy1 = self._cell_coords(self.bboxes[good, 2],
+                                     self.bboxes[good, 3])
+        widths = ix1 - ix0 + 1
+        counts = widths * (iy1 - iy0 + 1)
+
+        # Expand each feature into every cell that it overlaps.
+        owners = np.repeat(np.arange(len(good)), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) -
+                                                     counts, counts)
+        cellX = ix0[owners] + within % widths[owners]
+        cellY = iy0[owners] + within // widths[owners]
+        cellIds = cellY * cellsPerSide + cellX
+
+        order = np.argsort(cellIds, kind='mergesort')
+        self.featureIds = good[owners[order]]
+        self.cellStarts = np.concatenate(([0], np.cumsum(
+                    np.bincount(cellIds, minlength=cellsPerSide ** 2))))
+
+    def _cell_coords(self, xs, ys) :
+        x0, y0, dx, dy, nx, ny = self.grid
+        ixs = np.clip(np.floor((xs - x0) / dx), 0, nx - 1).astype(int)
+        iys = np.clip(np.floor((ys - y0) / dy), 0, ny - 1).astype(int)
+        return ixs, iys
+
+    def __len__(self) :
+        return len(self.bboxes)
+
+    def query(self, bbox) :
+        """
+        Sorted indices of the features whose bounding boxes intersect
+        *bbox*, given as (xmin, ymin, xmax, ymax).
+        """
+        xmin, ymin, xmax, ymax = bbox
+        x0, y0, dx, dy, nx, ny = self.grid
+        if (xmax < x0 or ymax < y0 or
+            xmin > x0 + dx * nx or ymin > y0 + dy * ny) :
+            return np.zeros(0, dtype=int)
+
+        ix0, iy0 = self._cell_coords(np.array([xmin]), np.array([ymin]))
+        ix1, iy1 = self._cell_coords(np.array([xmax]), np.array([ymax]))
+        nx = int(nx)
+        # Within a row of the grid, the cells are contiguous in the table.
+        candidates = np.concatenate(
+            [self.featureIds[self.cellStarts[row * nx + ix0[0]]:
+                             self.cellStarts[row * nx + ix1[0] + 1]] for
+             row in range(iy0[0], iy1[0] + 1)])
+        candidates = np.unique(candidates)
+
+        boxes = self.bboxes[candidates]
+        return candidates[(boxes[:, 0] <= xmax) & (boxes[:, 2] >= xmin) &
+                          (boxes[:, 1] <= ymax) & (boxes[:, 3] >= ymin)]
+
+    def arrays(self) :
+        """
+        Dictionary of the arrays that make up the index, keyed by
+        the names in `arrayNames`.
+        """
+        return dict((name, getattr(self, name)) for name in self.arrayNames)
+
+    @classmethod
+    def from_arrays(cls, arrays) :
+        """
+        Rebuild an index from the output of :meth:`arrays`
+        (e.g., memory-mapped .npy files).
+        """
+        index = cls(None)
+        for name in cls.arrayNames :
+            setattr(index, name, arrays[name])
+        return index
+
+    def save(self, filename) :
+        """
+        Save the index to *filename* as an uncompressed .npz file.
+        """
+        np.savez(filename, **self.arrays())
+
+    @classmethod
+    def load(cls, filename) :
+        """
+        Load an index saved with :meth:`save`.
+        """
+        with np.load(filename) as npz :
+            return cls.from_arrays(dict((name, npz[name]) for
+                                        name in cls.arrayNames))
 #------------------------------#
 ################################
 
@@ -22,6 +22,10 @@ def MakePPI(x, y, vals, norm, ref_table, ax=None, mask=None,
     into a masked_array if there are NaNs and no *mask* is
     provided.
 
+    *x* and *y* can also be compact coordinates that only broadcast
+    against each other (e.g., (azi, 1) and (1, range) arrays from the
+    loaders in :mod:`BRadar.io` with *compact=True*).
+
     *meth*      ['pc'|'pcmesh'|'im']
         Plotting method to use (pcolor, pcolormesh, imshow).
         pcolor() ('pc') works for the most generic case of arbitrary
@@ -40,6 +44,12 @@ def MakePPI(x, y, vals, norm, ref_table, ax=None, mask=None,
     if ax is None :
         ax = plt.gca()
 
+    x = np.asanyarray(x)
+    y = np.asanyarray(y)
+    if x.ndim == 2 and y.ndim == 2 and x.shape != y.shape :
+        # Zero-copy views for the broadcastable coordinates
+        (x, y) = np.broadcast_arrays(x, y)
+
     if mask is None :
         mask = np.isnan(vals)
 
@@ -164,6 +174,9 @@ class RadarAnim(FuncAnimation) :
                         and data (unless *sps* is None).
 
         All other kwargs for :class:`FuncAnimation` are also allowed.
+        With *blit=True*, the static parts of the axes (e.g., map layers)
+        are rendered once into a cached background image that is restored
+        for each frame, and only the radar images are redrawn each frame.
 
         To use, specify the axes to display the image on using
         :meth:`add_axes`. If no axes are added by draw time, then this class
@@ -304,8 +317,10 @@ class RadarAnim(FuncAnimation) :
 
         if frametime > self.endTime :
             # We have no additional data to display.
-            # Just simply hold until frametime cycles
-            return None
+            # Just simply hold until frametime cycles.
+            # (When blitting, the held images still need to be
+            #  drawn over the restored background.)
+            return self._ims
 
         if frameindex % self.save_count == 0 and frameindex > 0 :
             # Force a cycling of the data
@@ -321,9 +336,8 @@ class RadarAnim(FuncAnimation) :
 
             print("CurrTime:", str(self.curr_time))
             self._advance_anim()
-            return self._ims
-        else :
-            return None
+
+        return self._ims
 
 
     def add_axes(self, ax, **kwargs) :
@@ -369,21 +383,61 @@ class RadarAnim(FuncAnimation) :
 
 
 class RadarDisplay(object) :
-    def __init__(self, ax, radarData, xs=None, ys=None) :
+    def __init__(self, ax, radarData, xs=None, ys=None, blit=False) :
         """
         Create a display for radar data.
+
+        *blit*      If True, everything on the figure except the radar
+                    image and the title (e.g., map layers) is rendered
+                    into a cached background image whenever the figure
+                    is fully redrawn.  Changing frames then only restores
+                    that background and draws the radar image and title
+                    over it (see :meth:`draw`).  Default is False.
         """
         self.ax = ax
         self.radarData = radarData
         self._im = None
         self._title = None
         self._curr_time = None
+        self._blit = blit
+        self._background = None
         self.frameIndex = 0
         data = next(self.radarData)
         self.xs = xs if xs is not None else data['lons']
         self.ys = ys if ys is not None else data['lats']
+        if self._blit :
+            self._drawcid = ax.figure.canvas.mpl_connect('draw_event',
+                                                         self._on_draw)
         self.refresh_display()
 
+    def _on_draw(self, event) :
+        """
+        After a full redraw, grab the (static) background and
+        draw the animated artists on top of it.
+        """
+        canvas = self.ax.figure.canvas
+        self._background = canvas.copy_from_bbox(self.ax.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self) :
+        self.ax.draw_artist(self._im)
+        self.ax.draw_artist(self._title)
+
+    def draw(self) :
+        """
+        Update the canvas with the current frame.  When blitting, only
+        the radar image and the title are redrawn over the cached
+        background.  Otherwise, a full redraw is requested.
+        """
+        canvas = self.ax.figure.canvas
+        if not self._blit or self._background is None :
+            canvas.draw_idle()
+            return
+
+        canvas.restore_region(self._background)
+        self._draw_animated()
+        canvas.blit(self.ax.figure.bbox)
+
     def next(self) :
         if ((self.frameIndex + 1) <= (len(self.radarData) - 1)) :
             self.radarData.next()
@@ -430,7 +484,8 @@ class RadarDisplay(object) :
             self._im = MakeReflectPPI(data['vals'][0], self.ys, self.xs,
                                       meth='pcmesh', ax=self.ax,
                                       colorbar=False, axis_labels=False,
-                                      zorder=0, mask=False)
+                                      zorder=0, mask=False,
+                                      animated=self._blit)
         else :
             self._im.set_array(data['vals'][0, :-1, :-1].flatten())
 
@@ -447,7 +502,8 @@ class RadarDisplay(object) :
 
         # Update axis title label
         if self._title is None :
-            self._title = self.ax.set_title(theDateTime)
+            self._title = self.ax.set_title(theDateTime,
+                                            animated=self._blit)
         else :
             self._title.set_text(theDateTime)
 
@@ -511,7 +567,13 @@ class BaseControlSys(object) :
         """
         if event.key in self.keymap :
             self.keymap[event.key]['func']()
-            self.fig.canvas.draw_idle()
+            # Displays without a draw() method (e.g., from before
+            # blitting was supported) just get a full redraw.
+            draw = getattr(self.rd, 'draw', None)
+            if draw is not None :
+                draw()
+            else :
+                self.fig.canvas.draw_idle()
 
     def step_back(self) :
         self.rd.prev()
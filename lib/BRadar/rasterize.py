@@ -1,7 +1,8 @@
 from __future__ import print_function
 import numpy as np
-from matplotlib.nxutils import points_inside_poly
-from maputils import sph2latlon, latlon2pix, makerefmat
+from matplotlib.path import Path
+from BRadar.maputils import sph2latlon, latlon2pix, makerefmat
+from BRadar.io import ScaledArray
 
 from multiprocessing import Pool
 
@@ -28,16 +29,44 @@ def Rastify(statLat, statLon, origData, azimuths,
     *cellSize* kwarg, and the axis will be automatically determined by
     the limits of the supplied inputs.
 
+    The *azimuths* and *rangeGates* (and *elevAngle*) only need to
+    broadcast against *origData*, so compact coordinates like an (azi, 1)
+    azimuth array and a (1, range) range gate array can be given directly.
+
+    *origData* can also be a :class:`BRadar.io.ScaledArray` of packed
+    integers (e.g., from LoadLevel2(..., decode=False)).  Then, the
+    rasterization is done on the raw integers and only the final grid
+    is decoded.  Missing data are always dropped in that case.
+
     Author: Benjamin Root
     """
     if (latAxis is None or lonAxis is None) and cellSize is None :
         raise ValueError("Must specify *cellSize* if *latAxis* and/or"
                          "*lonAxis* is not given")
 
-    goodVals = (~np.isnan(origData) | ~mask)
+    codec = None
+    if isinstance(origData, ScaledArray) :
+        if origData.scale_factor > 0 :
+            # Decoding is monotonic, so taking the maximum
+            # of the raw integers gives the same result.
+            codec = origData
+            goodVals = origData.valid_mask()
+            origData = np.asarray(origData.raw)
+        else :
+            origData = origData[...]
+
+    if codec is None :
+        # (~mask would be -2 for mask=True, not False.)
+        goodVals = (~np.isnan(origData) | np.logical_not(mask))
+
+    # Zero-stride views, so the coordinates are never
+    # expanded beyond the selected gates.
     origData = origData[goodVals]
-    azimuths = azimuths[goodVals]
-    rangeGates = rangeGates[goodVals]
+    azimuths = np.broadcast_to(azimuths, goodVals.shape)[goodVals]
+    rangeGates = np.broadcast_to(rangeGates, goodVals.shape)[goodVals]
+    if np.size(elevAngle) > 1 :
+        elevAngle = np.broadcast_to(elevAngle,
+                                    goodVals.shape)[goodVals][:, np.newaxis]
  
     # These arrays are for creating the verticies of the resolution volume
     # in 2-D.
@@ -116,6 +145,10 @@ def Rastify(statLat, statLon, origData, azimuths,
                 or (rastData[containedPoint] < val)) :
                 rastData[containedPoint] = val
 
+    if codec is not None :
+        # NaNs stay NaNs
+        rastData = rastData * codec.scale_factor + codec.add_offset
+
     return (rastData, latAxis, lonAxis)
 
 def _raster_points(tmpx, tmpy, gridShape) :
@@ -128,8 +161,8 @@ def _raster_points(tmpx, tmpy, gridShape) :
         # so, none of them are good.
         return ([], [])
 
-    resVol = zip(tmpx[[0, 1, 2, 3, 0]],
-                 tmpy[[0, 1, 2, 3, 0]])
+    resVol = Path(np.column_stack((tmpx[[0, 1, 2, 3, 0]],
+                                   tmpy[[0, 1, 2, 3, 0]])))
 
     # Getting all of the points that the polygon has, and then some.
     # This meshed grid is bounded by the domain.
@@ -139,7 +172,7 @@ def _raster_points(tmpx, tmpy, gridShape) :
              int(min(np.ceil(max(tmpx)), gridShape[1] - 1))))
     (ygrid, xgrid) = np.meshgrid(np.arange(bbox[0][0], bbox[0][1] + 1),
                                  np.arange(bbox[1][0], bbox[1][1] + 1))
-    gridPoints = zip(xgrid.flat, ygrid.flat)
+    gridPoints = np.column_stack((xgrid.ravel(), ygrid.ravel()))
 
     if len(gridPoints) == 0 :
         print("Bad situation...:", bbox, gridShape, min(tmpy), max(tmpy), \
@@ -149,7 +182,7 @@ def _raster_points(tmpx, tmpy, gridShape) :
     # Determines which points fall within the resolution volume.  These
     # points will be the ones that will be assigned the value of the
     # original data point that the resolution volume represents.
-    goodPoints = points_inside_poly(gridPoints, resVol)
+    goodPoints = resVol.contains_points(gridPoints)
 
     return (ygrid.flat[goodPoints], xgrid.flat[goodPoints])
 
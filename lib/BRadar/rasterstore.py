@@ -0,0 +1,354 @@
+"""
+A compact on-disk store for time series of rasterized radar data.
+
+A store is a directory holding:
+    'header.npz'        The lat/lon axes (shared by all frames), the tile
+                        size, and the variable and station names.  It is
+                        written once, with the first frame.
+    'frames.bin'        One fixed-size record per frame of its scan time,
+                        quantization and tile index.  Adding a frame only
+                        appends its record.
+    'frame_NNNNNN.bin'  One file per frame of zlib-compressed tiles.
+
+Each frame is quantized to 16-bit integers with its own scale and offset
+(NaNs are kept, and +/-inf become the ends of the range), and cut into
+square tiles that are compressed separately.
+So, reading one frame, or a small lat/lon window of it, only decompresses
+the tiles that are needed.
+
+See :class:`RasterStore`, or use :func:`BRadar.io.LoadRastRadar` on the
+directory.
+"""
+
+import os
+import os.path
+import zlib
+import tempfile
+import numpy as np
+
+# Raw value reserved for NaNs.  Valid values use +/- _MAX_RAW.
+_MISSING_RAW = -32768
+_MAX_RAW = 32766
+
+_HEADER_NAME = 'header.npz'
+_FRAMES_NAME = 'frames.bin'
+
+
+def _frame_name(index) :
+    return 'frame_%06d.bin' % index
+
+
+def _axis_slice(axis, lims) :
+    """
+    Slice of the (ascending or descending) *axis* that covers
+    the closed interval *lims* (the whole axis if *lims* is None).
+    """
+    if lims is None :
+        return slice(0, len(axis))
+    inside = np.flatnonzero((axis >= min(lims)) & (axis <= max(lims)))
+    if len(inside) == 0 :
+        return slice(0, 0)
+    return slice(inside[0], inside[-1] + 1)
+
+
+def Quantize(vals, scale=None, offset=None) :
+    """
+    Pack *vals* into 16-bit integers, with NaN as -32768.  Values
+    beyond the range (including +/-inf) are clipped to its ends.
+
+    If *scale* and/or *offset* are not given, they are chosen to
+    span the finite range of *vals*.
+
+    Returns (raw, scale, offset), such that raw * scale + offset
+    recovers *vals* to within half of *scale*.
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    good = ~np.isnan(vals)
+    if offset is None or scale is None :
+        finite = np.isfinite(vals)
+        if np.any(finite) :
+            lo, hi = vals[finite].min(), vals[finite].max()
+        else :
+            lo = hi = 0.0
+        if offset is None :
+            offset = (lo + hi) / 2.0
+        if scale is None :
+            scale = (hi - lo) / (2.0 * _MAX_RAW)
+            if scale == 0 :
+                scale = 1.0
+
+    raw = np.empty(vals.shape, dtype=np.int16)
+    raw[~good] = _MISSING_RAW
+    raw[good] = np.clip(np.round((vals[good] - offset) / scale),
+                        -_MAX_RAW, _MAX_RAW)
+    return raw, float(scale), float(offset)
+
+
+def Dequantize(raw, scale, offset, dtype=np.float32) :
+    """
+    Inverse of :func:`Quantize`.
+    """
+    vals = raw.astype(dtype)
+    vals *= scale
+    vals += offset
+    vals[raw == _MISSING_RAW] = np.nan
+    return vals
+
+
+class RasterStore(object) :
+    def __init__(self, path, tileSize=256, level=1) :
+        """
+        Open the store in directory *path*, creating the directory
+        if it does not exist.
+
+        *tileSize*      Width of the square tiles, in grid cells.
+                        Only used by a new (empty) store.
+
+        *level*         zlib compression level for new frames.
+                        Level 1 is fast and, because of the byte shuffle,
+                        still compresses radar fields well.
+        """
+        self.path = path
+        self.level = level
+        if not os.path.isdir(path) :
+            os.makedirs(path)
+
+        headerFile = os.path.join(path, _HEADER_NAME)
+        self._frames = None
+        self._count = 0
+        if os.path.exists(headerFile) :
+            with np.load(headerFile) as header :
+                self._header = dict((name, header[name]) for
+                                    name in header.files)
+            self.tileSize = int(self._header['tile_size'])
+            self._read_frames()
+        else :
+            self._header = None
+            self.tileSize = tileSize
+
+    def __len__(self) :
+        return self._count
+
+    def _frame_dtype(self) :
+        tileRows, tileCols = self._tile_grid()
+        return np.dtype([('time', '<i8'), ('scale', '<f8'),
+                         ('offset', '<f8'),
+                         ('tile_offsets', '<i8',
+                          (tileRows * tileCols + 1,))])
+
+    def _read_frames(self) :
+        framesFile = os.path.join(self.path, _FRAMES_NAME)
+        dtype = self._frame_dtype()
+        if os.path.exists(framesFile) :
+            # A partly written last record (e.g., from a crash) is ignored.
+            count = os.path.getsize(framesFile) // dtype.itemsize
+            self._frames = np.fromfile(framesFile, dtype=dtype, count=count)
+        else :
+            self._frames = np.zeros((0,), dtype=dtype)
+        self._count = len(self._frames)
+
+    @property
+    def lats(self) :
+        return self._header['lats']
+
+    @property
+    def lons(self) :
+        return self._header['lons']
+
+    @property
+    def times(self) :
+        """
+        Scan time (seconds since 1970-1-1) of each frame.
+        """
+        if self._header is None :
+            return np.zeros((0,), dtype=np.int64)
+        return self._frames['time'][:self._count]
+
+    @property
+    def var_name(self) :
+        return str(self._header['var_name'])
+
+    @property
+    def station(self) :
+        return str(self._header['station'])
+
+    def _tile_grid(self) :
+        return (-(-len(self.lats) // self.tileSize),
+                -(-len(self.lons) // self.tileSize))
+
+    def find_time(self, scanTime) :
+        """
+        Index of the frame whose scan time is closest to *scanTime*.
+        """
+        times = self.times
+        if len(times) == 0 :
+            raise IndexError("The raster store is empty")
+        order = np.argsort(times, kind='mergesort')
+        pos = np.clip(np.searchsorted(times[order], scanTime),
+                      1, max(len(times) - 1, 1))
+        candidates = order[[pos - 1, min(pos, len(times) - 1)]]
+        return int(candidates[np.argmin(np.abs(times[candidates] -
+                                                scanTime))])
+
+    def append(self, rastData, scanTime, latAxis=None, lonAxis=None,
+               varName=None, station=None, scale=None, offset=None) :
+        """
+        Add the 2-D (lat, lon) grid *rastData* as a new frame.
+
+        The first frame sets *latAxis*, *lonAxis*, *varName* and
+        *station* for the whole store.  They can be left out
+        afterwards, but must match if given.
+
+        *scale* and *offset* fix the quantization (e.g., scale=0.01 for
+        reflectivity to the hundredth of a dBZ).  By default, each frame
+        is quantized to span its own range of values.
+
+        Returns the index of the new frame.
+        """
+        rastData = np.asarray(rastData)
+        if rastData.ndim == 3 and rastData.shape[0] == 1 :
+            rastData = rastData[0]
+
+        if self._header is None :
+            if latAxis is None or lonAxis is None :
+                raise ValueError("The first frame needs latAxis and lonAxis")
+            self._header = {'lats': np.asarray(latAxis, dtype=np.float32),
+                            'lons': np.asarray(lonAxis, dtype=np.float32),
+                            'tile_size': np.array(self.tileSize),
+                            'var_name': np.array(varName or 'value'),
+                            'station': np.array(station or '')}
+            newStore = True
+        else :
+            newStore = False
+            if ((latAxis is not None and
+                 not np.allclose(latAxis, self.lats)) or
+                (lonAxis is not None and
+                 not np.allclose(lonAxis, self.lons))) :
+                raise ValueError("The axes do not match the raster store")
+            if varName is not None and varName != self.var_name :
+                raise ValueError("Variable %s does not match %s" %
+                                 (varName, self.var_name))
+
+        if rastData.shape != (len(self.lats), len(self.lons)) :
+            if newStore :
+                self._header = None
+            raise ValueError("Grid shape %s does not match the axes %s" %
+                             (rastData.shape,
+                              (len(self.lats), len(self.lons))))
+
+        raw, scale, offset = Quantize(rastData, scale, offset)
+
+        # Compress each tile on its own, with the low and high bytes
+        # split apart, which makes smooth fields much more compressible.
+        tileRows, tileCols = self._tile_grid()
+        size = self.tileSize
+        chunks = []
+        for row in range(tileRows) :
+            for col in range(tileCols) :
+                tile = raw[row*size:(row + 1)*size, col*size:(col + 1)*size]
+                shuffled = np.ascontiguousarray(tile, dtype='<i2').view(np.uint8)
+                shuffled = shuffled.reshape((-1, 2)).T.tobytes()
+                chunks.append(zlib.compress(shuffled, self.level))
+
+        index = len(self)
+        with open(os.path.join(self.path, _frame_name(index)), 'wb') as f :
+            for chunk in chunks :
+                f.write(chunk)
+
+        if newStore :
+            self._write_header()
+            self._read_frames()
+
+        record = np.zeros((1,), dtype=self._frames.dtype)
+        record['time'] = int(scanTime)
+        record['scale'] = scale
+        record['offset'] = offset
+        record['tile_offsets'] = np.concatenate(([0], np.cumsum(
+            [len(chunk) for chunk in chunks])))
+        # The frame's record goes last, so that readers only see
+        # frames that are completely written.
+        with open(os.path.join(self.path, _FRAMES_NAME), 'ab') as f :
+            f.write(record.tobytes())
+
+        # Grow the in-memory records by doubling, not per frame.
+        if self._count == len(self._frames) :
+            self._frames = np.concatenate((self._frames,
+                                           np.zeros(max(self._count, 16),
+                                                    dtype=self._frames.dtype)))
+        self._frames[self._count] = record[0]
+        self._count += 1
+        return index
+
+    def _write_header(self) :
+        # Write to a temporary file first, so that readers never
+        # see a partially written header.
+        fd, tmpName = tempfile.mkstemp(suffix='.npz', dir=self.path)
+        try :
+            with os.fdopen(fd, 'wb') as f :
+                np.savez(f, **self._header)
+            os.rename(tmpName, os.path.join(self.path, _HEADER_NAME))
+        except :
+            os.remove(tmpName)
+            raise
+
+    def read(self, index, latlim=None, lonlim=None, dtype=np.float32) :
+        """
+        Read frame *index*, or just the part of it inside the
+        *latlim* and/or *lonlim* (min, max) limits.
+
+        Only the tiles that overlap the window are decompressed.
+
+        Returns (vals, lats, lons) for the window.
+        """
+        if not -len(self) <= index < len(self) :
+            raise IndexError("Frame %d is out of range" % index)
+        index = index % len(self)
+
+        latSlice = _axis_slice(self.lats, latlim)
+        lonSlice = _axis_slice(self.lons, lonlim)
+        vals = np.empty((latSlice.stop - latSlice.start,
+                         lonSlice.stop - lonSlice.start), dtype=dtype)
+
+        if vals.size > 0 :
+            raw = self._read_raw(index, latSlice, lonSlice)
+            vals[:] = Dequantize(raw, self._frames['scale'][index],
+                                 self._frames['offset'][index], dtype)
+
+        return vals, self.lats[latSlice], self.lons[lonSlice]
+
+    def _read_raw(self, index, latSlice, lonSlice) :
+        size = self.tileSize
+        tileCols = self._tile_grid()[1]
+        tileOffsets = self._frames['tile_offsets'][index]
+        latCnt, lonCnt = len(self.lats), len(self.lons)
+
+        raw = np.empty((latSlice.stop - latSlice.start,
+                        lonSlice.stop - lonSlice.start), dtype=np.int16)
+        with open(os.path.join(self.path, _frame_name(index)), 'rb') as f :
+            for row in range(latSlice.start // size,
+                             (latSlice.stop - 1) // size + 1) :
+                for col in range(lonSlice.start // size,
+                                 (lonSlice.stop - 1) // size + 1) :
+                    tileNum = row * tileCols + col
+                    f.seek(tileOffsets[tileNum])
+                    chunk = f.read(tileOffsets[tileNum + 1] -
+                                   tileOffsets[tileNum])
+
+                    # Undo the byte shuffle
+                    tileShape = (min(size, latCnt - row*size),
+                                 min(size, lonCnt - col*size))
+                    tile = np.frombuffer(zlib.decompress(chunk),
+                                         dtype=np.uint8)
+                    tile = tile.reshape((2, -1)).T.copy().view('<i2')
+                    tile = tile.reshape(tileShape)
+
+                    # Overlap of the tile and the window, in grid cells
+                    rowLo = max(row*size, latSlice.start)
+                    rowHi = min((row + 1)*size, latSlice.stop)
+                    colLo = max(col*size, lonSlice.start)
+                    colHi = min((col + 1)*size, lonSlice.stop)
+                    raw[rowLo - latSlice.start:rowHi - latSlice.start,
+                        colLo - lonSlice.start:colHi - lonSlice.start] = \
+                        tile[rowLo - row*size:rowHi - row*size,
+                             colLo - col*size:colHi - col*size]
+        return raw
@@ -0,0 +1,241 @@
+"""
+Zero-copy handoff of radar data dictionaries between processes.
+
+:func:`PublishRadar` copies the arrays of a radar data dictionary (as
+returned by the loaders in :mod:`BRadar.io`) into one block of shared
+memory, once.  Its small, picklable *descriptor* is all that needs to
+be sent to other processes, where :func:`AttachRadar` rebuilds the
+dictionary with NumPy views of the shared block.  Nested dictionaries
+(e.g., from loading several moments) are supported, and broadcast
+coordinates (see *compact=True*) stay compact.
+
+The lifetime of the block is explicit: it exists until the publisher
+calls :meth:`SharedRadar.unlink` (or leaves its ``with`` block), or until
+any process calls :func:`UnlinkRadar` with the descriptor.  Views must
+not be used after that, and attached processes should :meth:`close` their
+:class:`SharedRadarView` when they are done with it.
+
+    >>> with PublishRadar(LoadLevel2(filename)) as shared :
+    ...     results = pool.map(work, [shared.descriptor] * 4)
+
+where each ``work(descriptor)`` does::
+
+    with AttachRadar(descriptor) as view :
+        radData = view.data
+        ...
+"""
+
+import numpy as np
+from multiprocessing import shared_memory
+
+from BRadar.io import LoadRadar
+
+# Arrays are placed on cache-line boundaries in the block.
+_ALIGN = 64
+
+
+def _open_block(name) :
+    """
+    Attach to the existing shared memory block *name*.
+    """
+    try :
+        # Python 3.13+: don't let this process' resource tracker
+        # remove the block when this process ends.
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError :
+        return shared_memory.SharedMemory(name=name)
+
+
+def _compact(value) :
+    """
+    Undo any broadcasting of *value*.  Returns the smallest array that
+    broadcasts to *value*, and whether that is needed on attach.
+    """
+    if value.ndim > 0 and 0 in value.strides and value.size > 0 :
+        return value[tuple(slice(0, 1) if stride == 0 else slice(None) for
+                           stride in value.strides)], True
+    return value, False
+
+
+def _flatten(radData, path=()) :
+    """
+    (key path, value) pairs of the, possibly nested, *radData*.
+    """
+    for key, value in radData.items() :
+        if isinstance(value, dict) :
+            for item in _flatten(value, path + (key,)) :
+                yield item
+        else :
+            yield path + (key,), value
+
+
+def _is_array(value) :
+    return (isinstance(value, np.ndarray) and value.ndim > 0) or (
+        not isinstance(value, (np.generic, str, bytes)) and
+        hasattr(value, '__array__') and np.ndim(value) > 0)
+
+
+class SharedRadar(object) :
+    def __init__(self, radData) :
+        """
+        Copy the arrays of the radar data dictionary *radData* into a new
+        shared memory block.  Other values (scalars, strings, datetimes)
+        go into the :attr:`descriptor` itself.
+
+        Use :func:`PublishRadar` rather than this directly.
+        """
+        arrays = []
+        values = []
+        size = 0
+        for keyPath, value in _flatten(radData) :
+            if _is_array(value) :
+                value = np.asarray(value)
+                fullShape = value.shape
+                value, broadcast = _compact(value)
+                offset = -(-size // _ALIGN) * _ALIGN
+                arrays.append((keyPath, offset, value,
+                               fullShape if broadcast else None))
+                size = offset + value.nbytes
+            else :
+                values.append((keyPath, value))
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        buf = self._shm.buf
+        arrayInfo = []
+        for keyPath, offset, value, fullShape in arrays :
+            view = np.ndarray(value.shape, dtype=value.dtype, buffer=buf,
+                              offset=offset)
+            view[...] = value
+            # Let go of the view, or the block can not be closed.
+            del view
+            arrayInfo.append((keyPath, offset, value.shape, value.dtype.str,
+                              fullShape))
+
+        self.descriptor = {'name': self._shm.name, 'arrays': arrayInfo,
+                           'values': values}
+
+    @property
+    def name(self) :
+        return self.descriptor['name']
+
+    def close(self) :
+        """
+        Release this process' mapping of the block, leaving the block
+        for other processes.  Safe to call more than once.
+        """
+        if self._shm is not None :
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self) :
+        """
+        Release and destroy the block.  Safe to call more than once.
+        """
+        if self._shm is not None :
+            shm = self._shm
+            self.close()
+            try :
+                shm.unlink()
+            except FileNotFoundError :
+                # Already done by UnlinkRadar()
+                pass
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *args) :
+        self.unlink()
+
+
+class SharedRadarView(object) :
+    def __init__(self, descriptor, writable=False) :
+        """
+        Rebuild the radar data dictionary of *descriptor* (see
+        :attr:`SharedRadar.descriptor`) in :attr:`data`, with
+        views of the shared arrays.
+
+        Use :func:`AttachRadar` rather than this directly.
+        """
+        self._shm = _open_block(descriptor['name'])
+        self.data = {}
+        for keyPath, value in descriptor['values'] :
+            self._store(keyPath, value)
+
+        for keyPath, offset, shape, dtype, fullShape in descriptor['arrays'] :
+            view = np.ndarray(shape, dtype=np.dtype(dtype),
+                              buffer=self._shm.buf, offset=offset)
+            view.flags.writeable = writable
+            if fullShape is not None :
+                view = np.broadcast_to(view, fullShape)
+            self._store(keyPath, view)
+
+    def _store(self, keyPath, value) :
+        data = self.data
+        for key in keyPath[:-1] :
+            data = data.setdefault(key, {})
+        data[keyPath[-1]] = value
+
+    def close(self) :
+        """
+        Drop the views and detach from the block.  The arrays in
+        :attr:`data` must not be used (or still be referenced
+        elsewhere) afterwards.  Safe to call more than once.
+        """
+        self.data = None
+        if self._shm is not None :
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *args) :
+        self.close()
+
+
+def PublishRadar(radData) :
+    """
+    Copy the radar data dictionary *radData* into shared memory.
+
+    Returns the owning :class:`SharedRadar`, whose :attr:`descriptor`
+    can be sent to other processes for :func:`AttachRadar`.
+    """
+    return SharedRadar(radData)
+
+
+def AttachRadar(descriptor, writable=False) :
+    """
+    Attach to the published radar data of *descriptor*.
+
+    Returns a :class:`SharedRadarView`, whose :attr:`data` is the radar
+    data dictionary, with read-only (unless *writable*) views of the
+    shared arrays.
+    """
+    return SharedRadarView(descriptor, writable)
+
+
+def UnlinkRadar(descriptor) :
+    """
+    Destroy the shared memory block of *descriptor*, from any process.
+    For example, after the data from :func:`LoadShared` is done with.
+    """
+    shm = _open_block(descriptor['name'])
+    shm.close()
+    shm.unlink()
+
+
+def LoadShared(filename, load_func=None, **kwargs) :
+    """
+    Load *filename* and publish it in shared memory, such as in a
+    loader process of a pool.  The keyword arguments are passed
+    on to *load_func* (default: :func:`BRadar.io.LoadRadar`).
+
+    Returns the descriptor.  The block outlives this call, so the caller
+    takes over its lifetime, and must :func:`UnlinkRadar` it when done.
+    """
+    if load_func is None :
+        load_func = LoadRadar
+
+    shared = PublishRadar(load_func(filename, **kwargs))
+    shared.close()
+    return shared.descriptor
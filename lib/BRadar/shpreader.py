@@ -0,0 +1,183 @@
+"""
+A lightweight reader for ESRI shapefiles, such as the ones bundled
+in the shapefiles directory.
+
+The .shp and .shx files are memory-mapped, and the geometry is decoded
+straight into NumPy arrays:
+    'verts'     N x 2 array of the concatenated (x, y) vertices
+    'offsets'   Index into 'verts' of the start of each part (polyline
+                or ring), plus a final entry of N.
+    'records'   The record number that each part belongs to.
+
+Point and MultiPoint records are treated as parts of one vertex each.
+No Python object is made per vertex.
+"""
+
+import os.path
+import numpy as np
+
+# Shape types (see the ESRI Shapefile Technical Description)
+NULL = 0
+POINT = 1
+POLYLINE = 3
+POLYGON = 5
+MULTIPOINT = 8
+
+# The Z and M variants store the x/y data the same way as their 2-D
+# counterparts, just with more data afterwards, which is ignored here.
+_point_types = (POINT, 11, 21)
+_poly_types = (POLYLINE, POLYGON, 13, 15, 23, 25)
+_multipoint_types = (MULTIPOINT, 18, 28)
+
+
+def _gather(buf, positions, dtype) :
+    """
+    Read one value of *dtype* from byte buffer *buf* at
+    each of the byte *positions*.
+    """
+    dtype = np.dtype(dtype)
+    byteIndex = positions[:, np.newaxis] + np.arange(dtype.itemsize)
+    return buf[byteIndex].copy().view(dtype)[:, 0]
+
+
+def _base_name(filename) :
+    """
+    Strip a .shp/.shx/.dbf extension, if any.
+    """
+    root, ext = os.path.splitext(filename)
+    return root if ext.lower() in ('.shp', '.shx', '.dbf') else filename
+
+
+def ReadShapefile(filename) :
+    """
+    Read the geometry of a shapefile.
+
+    *filename*      Name of the shapefile, with or without the .shp
+                    extension.  The .shx index must be next to it.
+
+    Returns a dictionary with the following keys:
+        'shape_type'
+        'bbox'          (xmin, ymin, xmax, ymax) from the file header
+        'verts'
+        'offsets'
+        'records'
+    """
+    base = _base_name(filename)
+    shp = np.memmap(base + '.shp', dtype=np.uint8, mode='r')
+    shx = np.memmap(base + '.shx', dtype=np.uint8, mode='r')
+
+    shapeType = int(shp[32:36].view('<i4')[0])
+    bbox = tuple(shp[36:68].view('<f8'))
+
+    # The index holds the offset and content length (big-endian, in
+    # 16-bit words) of each record.  The content starts after the
+    # 8 byte record header.
+    index = shx[100:].view('>i4').reshape((-1, 2))
+    contents = index[:, 0].astype(np.int64) * 2 + 8
+    recTypes = _gather(shp, contents, '<i4')
+    good = recTypes != NULL
+    if np.any(recTypes[good] != shapeType) :
+        raise ValueError("Mixed shape types are not supported: %s" %
+                         filename)
+
+    if shapeType in _point_types :
+        starts = contents[good]
+        verts = np.column_stack((_gather(shp, starts + 4, '<f8'),
+                                 _gather(shp, starts + 12, '<f8')))
+        records = np.flatnonzero(good)
+        offsets = np.arange(len(records) + 1)
+
+    elif shapeType in _poly_types or shapeType in _multipoint_types :
+        isMulti = shapeType in _multipoint_types
+        numPoints = np.where(good, _gather(shp, contents +
+                                           (36 if isMulti else 40), '<i4'),
+                             0)
+        if isMulti :
+            numParts = numPoints
+            pointStarts = contents + 40
+        else :
+            numParts = np.where(good, _gather(shp, contents + 36, '<i4'), 0)
+            pointStarts = contents + 44 + 4 * numParts
+
+        # Points within a record are contiguous, so each record is just
+        # one view into the mapped file.
+        verts = [shp[start:start + 16 * count].view('<f8') for
+                 start, count in zip(pointStarts, numPoints) if count > 0]
+        verts = (np.concatenate(verts).reshape((-1, 2)) if len(verts) > 0
+                 else np.zeros((0, 2)))
+
+        recStarts = np.cumsum(numPoints) - numPoints
+        records = np.repeat(np.arange(len(contents)), numParts)
+        if isMulti :
+            partStarts = np.arange(numPoints.sum())
+        else :
+            # The part indices are relative to the start of the record.
+            firstPart = np.cumsum(numParts) - numParts
+            partNums = np.arange(numParts.sum()) - firstPart[records]
+            partStarts = (_gather(shp, contents[records] + 44 + 4 * partNums,
+                                  '<i4') + recStarts[records])
+        offsets = np.concatenate((partStarts, [len(verts)]))
+
+    else :
+        raise ValueError("Unsupported shape type %d: %s" %
+                         (shapeType, filename))
+
+    return {'shape_type': shapeType, 'bbox': bbox,
+            'verts': verts, 'offsets': offsets, 'records': records}
+
+
+def ReadDBF(filename) :
+    """
+    Read the attribute table (.dbf) of a shapefile.
+
+    *filename*      Name of the shapefile, with or without an extension.
+
+    Returns a dictionary of arrays, one per field, in field order
+    (see the 'fields' key).  Numeric fields become float arrays (NaN
+    for blanks), logical fields become boolean arrays, and all others
+    are arrays of stripped strings.  Deleted records are dropped, so
+    the 'records' key holds the record number (from 0) of each row.
+    """
+    base = _base_name(filename)
+    dbf = np.memmap(base + '.dbf', dtype=np.uint8, mode='r')
+
+    numRecs = int(dbf[4:8].view('<u4')[0])
+    headerLen = int(dbf[8:10].view('<u2')[0])
+    recLen = int(dbf[10:12].view('<u2')[0])
+
+    # Field descriptors are 32 bytes each, terminated by 0x0D
+    fields = []
+    pos = 32
+    while pos < headerLen - 1 and dbf[pos] != 0x0D :
+        desc = dbf[pos:pos + 32].tobytes()
+        name = desc[:11].split(b'\x00')[0].decode('latin-1')
+        fields.append((name, desc[11:12].decode('latin-1'),
+                       bytearray(desc)[16]))
+        pos += 32
+
+    dtype = [('_deleted', 'S1')] + [(name, 'S%d' % length) for
+                                     name, _, length in fields]
+    padding = recLen - sum(length for _, _, length in fields) - 1
+    if padding > 0 :
+        dtype.append(('_padding', 'V%d' % padding))
+    dtype = np.dtype(dtype)
+    table = np.frombuffer(dbf, dtype=dtype, count=numRecs, offset=headerLen)
+    kept = table['_deleted'] != b'*'
+    table = table[kept]
+
+    result = {'fields': [name for name, _, _ in fields],
+              'records': np.flatnonzero(kept)}
+    for name, fieldType, _ in fields :
+        col = np.char.strip(table[name])
+        if fieldType in ('N', 'F') :
+            values = np.empty(len(col))
+            blank = (col == b'')
+            values[blank] = np.nan
+            values[~blank] = col[~blank].astype(float)
+            result[name] = values
+        elif fieldType == 'L' :
+            result[name] = np.isin(col, [b'T', b't', b'Y', b'y'])
+        else :
+            result[name] = np.char.decode(col, 'latin-1')
+
+    return result
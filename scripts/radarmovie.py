@@ -1,5 +1,6 @@
 from BRadar.plotutils import RadarAnim, MakeReflectPPI
 from BRadar.io import LoadRastRadar, LoadLevel2, LoadPAR_lipn, LoadPAR_wdssii
+from BRadar.io import LoadRadar, SniffFormat
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -20,12 +21,21 @@ def load_wrapper(fname, loadfunc) :
 
     return dict(vals=radData['vals'][None, :, :], lons=az, lats=r, **radData)
 
-_load_funcs = dict(rast_nc=LoadRastRadar,
+def auto_load(fname) :
+    # Rasterized data is already on a lat/lon grid.
+    if SniffFormat(fname) == 'rast' :
+        return LoadRastRadar(fname)
+    return load_wrapper(fname, LoadRadar)
+
+_load_funcs = dict(auto=auto_load,
+                   rast_nc=LoadRastRadar,
                    lev2_nc=lambda fname: load_wrapper(fname, LoadLevel2),
                    lip_nc=lambda fname: load_wrapper(fname, LoadPAR_lipn),
                    wdssii=lambda fname: load_wrapper(fname, LoadPAR_wdssii))
 
-_projections = dict(rast_nc=None,
+# The 'auto' projection is decided by the format of the first file.
+_projections = dict(auto=None,
+                    rast_nc=None,
                     lev2_nc='polar',
                     lip_nc='polar',
                     wdssii='polar')
@@ -133,6 +143,8 @@ def main(args) :
         args.figsize = plt.figaspect(float(args.layout[0]) / args.layout[1])
 
     proj = _projections[args.loadfunc]
+    if args.loadfunc == 'auto' and SniffFormat(args.radarfiles[0]) != 'rast' :
+        proj = 'polar'
     """
     fig = plt.figure(figsize=args.figsize)
 
@@ -219,11 +231,12 @@ if __name__ == '__main__' :
                         help="FILEs of the radar data",
                         metavar="FILE")
     parser.add_argument("--loader", dest="loadfunc",
-                        choices=['rast_nc', 'lev2_nc', 'lip_nc', 'wdssii'],
-                        action='append',
+                        choices=['auto', 'rast_nc', 'lev2_nc', 'lip_nc',
+                                 'wdssii'],
                         help="Select the data loader for your files."
+                             " 'auto' detects the format of each file."
                              " Choices: %(choices)s. Default: %(default)s",
-                        metavar="LOADER", default='rast_nc')
+                        metavar="LOADER", default='auto')
     parser.add_argument("--save", dest="savefile", type=str,
                         help="Save the movie as OUTPUT",
                         metavar="OUTPUT", default=None)
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from BRadar.io import SaveRastRadar
+from BRadar.fileindex import RadarIndex
+from BRadar.rasterstore import RasterStore
+
+
+class RadarIndexUpdateTest(unittest.TestCase) :
+    def setUp(self) :
+        self.root = tempfile.mkdtemp()
+        lats = np.linspace(30.0, 31.0, 5)
+        lons = np.linspace(-98.0, -97.0, 6)
+        grid = np.zeros((5, 6), dtype=np.float32)
+        for name, scanTime in (('app_1.nc', 100), ('app_2.nc', 200),
+                               ('other_1.nc', 300)) :
+            SaveRastRadar(os.path.join(self.root, name), grid, lats, lons,
+                          scanTime, 'Reflectivity', 'KTLX')
+        store = RasterStore(os.path.join(self.root, 'store'))
+        store.append(grid, 400, lats, lons, 'Reflectivity', 'KTLX')
+
+    def tearDown(self) :
+        shutil.rmtree(self.root)
+
+    def test_patterns(self) :
+        with RadarIndex(':memory:') as index :
+            self.assertEqual(index.update(self.root), (4, 0))
+
+            # Files that don't match the pattern are not gone.
+            self.assertEqual(index.update(self.root, pattern='app*'), (0, 0))
+            self.assertEqual(len(index), 4)
+
+            os.remove(os.path.join(self.root, 'app_2.nc'))
+            os.remove(os.path.join(self.root, 'other_1.nc'))
+            self.assertEqual(index.update(self.root, pattern='app*'), (0, 1))
+            self.assertEqual(sorted(os.path.basename(path) for
+                                    path in index.query()),
+                             ['app_1.nc', 'other_1.nc', 'store'])
+
+            self.assertEqual(index.update(self.root, pattern='*'), (0, 1))
+            self.assertEqual(sorted(os.path.basename(path) for
+                                    path in index.query()),
+                             ['app_1.nc', 'store'])
+
+
+if __name__ == '__main__' :
+    unittest.main()
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from scipy.io import netcdf
+
+from BRadar.io import LoadRastRadar
+from BRadar.ingest import IngestService
+
+
+def _write_radialset(filename, scanTime) :
+    """
+    A small WDSSII RadialSet file of reflectivities.
+    """
+    nc = netcdf.netcdf_file(filename, 'w')
+    nc.createDimension('Azimuth', 36)
+    nc.createDimension('Gate', 20)
+    nc.TypeName = 'Reflectivity'
+    nc.DataType = 'RadialSet'
+    nc.MissingData = -99900.0
+    nc.RangeFolded = -99901.0
+    nc.Elevation = 0.5
+    nc.Latitude = 35.2
+    nc.Longitude = -97.4
+    nc.Time = scanTime
+    nc.RangeToFirstGate = 1000.0
+    nc.createVariable('Azimuth', 'f', ('Azimuth',))[:] = np.arange(0.0, 360.0,
+                                                                   10.0)
+    nc.createVariable('GateWidth', 'f', ('Azimuth',))[:] = 500.0
+    nc.createVariable('BeamWidth', 'f', ('Azimuth',))[:] = 10.0
+    refl = nc.createVariable('Reflectivity', 'f', ('Azimuth', 'Gate'))
+    refl[:] = np.linspace(0.0, 60.0, 36 * 20).reshape((36, 20))
+    nc.close()
+
+
+class IngestServiceTest(unittest.TestCase) :
+    def setUp(self) :
+        self.feedDir = tempfile.mkdtemp()
+        self.outDir = tempfile.mkdtemp()
+
+    def tearDown(self) :
+        shutil.rmtree(self.feedDir)
+        shutil.rmtree(self.outDir)
+
+    def test_run_once_defaults(self) :
+        # The default loader and rastifier, on a feed of two scans.
+        for index, scanTime in enumerate((1300000000, 1300000300)) :
+            filename = os.path.join(self.feedDir, 'scan%d.nc' % index)
+            _write_radialset(filename, scanTime)
+            settled = time.time() - 10
+            os.utime(filename, (settled, settled))
+
+        service = IngestService(self.feedDir, self.outDir, pattern='*.nc',
+                                cellSize=0.01, settle=1.0, workers=2)
+        asyncio.run(service.run_once())
+
+        self.assertEqual(service.failed, {})
+        self.assertEqual(len(service.processed), 2)
+        self.assertEqual(sorted(os.listdir(self.outDir)),
+                         ['NWRT_Reflectivity_20110313_070640.nc',
+                          'NWRT_Reflectivity_20110313_071140.nc'])
+
+        rast = LoadRastRadar(service.processed[os.path.join(self.feedDir,
+                                                            'scan0.nc')])
+        self.assertEqual(rast['scan_time'], 1300000000)
+        self.assertTrue(np.nanmax(rast['vals']) > 50.0)
+        self.assertEqual(service.stats()['total']['count'], 2)
+
+
+if __name__ == '__main__' :
+    unittest.main()